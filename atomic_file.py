@@ -0,0 +1,15 @@
+import json
+import os
+
+# Ecriture atomique des fichiers d'etat (symboles, cache des marches, offset Telegram): fichier
+# temporaire synchronise sur disque puis renomme. Un arret brutal laisse l'ancien fichier ou le
+# nouveau, jamais un fichier tronque.
+
+
+def save_json(file_path, data):
+    tmp_file = f"{file_path}.tmp"
+    with open(tmp_file, 'w') as f:
+        json.dump(data, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_file, file_path)
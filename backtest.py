@@ -0,0 +1,427 @@
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import math
+import os
+import random
+import selectors
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from listing_watch import unified_symbol
+from market_stream import MarketDataFeed
+from order_manager import OrderManager
+from pair_manager import PairManager
+from replay_server import load_messages
+
+# Backtest deterministe: des flux MEXC enregistres (un message brut par ligne JSON, comme pour
+# replay_server.py) sont rejoues a travers le vrai code de strategie (PairManager, EntryPricer,
+# StopEngine, OrderManager), face a un FakeExchange qui a l'interface de SpotExchange et modelise
+# la latence, les frais et les remplissages partiels. La boucle asyncio tourne sur une horloge
+# virtuelle: les attentes ne durent rien, une journee de ticks se rejoue en quelques secondes.
+# Les balayages de parametres tournent en parallele dans un pool de processus.
+
+
+# Selecteur qui ne bloque jamais: quand rien n'est pret, l'horloge virtuelle avance jusqu'a
+# la prochaine tache planifiee
+class VirtualSelector(selectors.DefaultSelector):
+    def __init__(self):
+        super().__init__()
+        self.loop = None
+
+    def select(self, timeout=None):
+        events = super().select(0)
+        if events or timeout == 0:
+            return events
+        if timeout is None:
+            raise RuntimeError("Simulation bloquee: aucune tache planifiee.")
+        self.loop.advance(timeout)
+        return events
+
+
+class VirtualClockLoop(asyncio.SelectorEventLoop):
+    def __init__(self, start=0.0):
+        selector = VirtualSelector()
+        super().__init__(selector)
+        selector.loop = self
+        self._now = start
+        # Autour de 1.7e9 s (horodatages des messages), l'ecart entre deux flottants est de ~2e-7 s:
+        # une resolution plus large garantit que l'avance de l'horloge atteint toujours l'echeance
+        self._clock_resolution = 1e-6
+
+    def time(self):
+        return self._now
+
+    def advance(self, seconds):
+        self._now += seconds
+
+
+# Positions en memoire, meme interface que PositionStore (pas de disque pendant un backtest)
+class MemoryStore():
+    def __init__(self):
+        self.positions = {}
+        self.traded_pairs = []
+        self.orders = []
+
+    def save_position(self, symbol, buy_price, quantity, venue=None):
+        self.positions[symbol] = {'symbol': symbol, 'buy_price': buy_price, 'quantity': quantity, 'venue': venue}
+
+    def clear_position(self, symbol):
+        self.positions.pop(symbol, None)
+
+    def record_order(self, handle):
+        self.orders.append({'symbol': handle.symbol, 'side': handle.side, 'status': handle.status, 'amount': handle.amount,
+                            'filled': handle.filled, 'average': handle.average, 'replaces': handle.replaces})
+
+    def is_traded(self, symbol):
+        return symbol in self.traded_pairs
+
+    def add_traded_pair(self, symbol):
+        if symbol not in self.traded_pairs:
+            self.traded_pairs.append(symbol)
+
+
+def truncate(value, decimals):
+    factor = 10 ** decimals
+    return math.floor(value * factor + 1e-9) / factor
+
+
+# Echange simule avec l'interface de SpotExchange. Un marche n'existe qu'a partir de son premier
+# message et n'est visible du bot qu'apres reload_markets(), comme un vrai listing. Un ordre arrive
+# a l'echange apres la latence: il prend d'abord la liquidite du carnet jusqu'a son prix limite,
+# puis le reste est execute par les transactions suivantes qui le croisent (remplissages partiels).
+# Les frais (fee_percentage) sont preleves en USDT sur chaque execution.
+class FakeExchange():
+    def __init__(self, fee_percentage=0.001, latency=0.05, jitter=0.0, balance=1000.0, amount_decimals=2, price_decimals=8, seed=0):
+        self.exchange_name = 'backtest'
+        self._auth = True
+        self.dry_run = False
+        self.fee_percentage = fee_percentage
+        self.latency = latency
+        self.jitter = jitter
+        self.initial_balance = balance
+        self.balance = balance
+        self.amount_decimals = amount_decimals
+        self.price_decimals = price_decimals
+        self.market = {}
+        self.prices = {}
+        self.books = {}
+        self.orders = {}
+        self.fills = []
+        self.fees = 0.0
+        self.holdings = {}
+        self._listed = {}
+        self._open = {}
+        self._ids = itertools.count(1)
+        self._random = random.Random(seed)
+
+    async def _delay(self):
+        delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    # Message brut MEXC vu par l'echange, avant que le bot ne le recoive
+    def on_message(self, message):
+        channel = message.get('c')
+        data = message.get('d')
+        if not channel or data is None:
+            return
+        market_id = message.get('s') or channel.split('@')[2]
+        symbol = unified_symbol(market_id)
+        if symbol not in self._listed:
+            self._listed[symbol] = {'id': market_id, 'symbol': symbol, 'spot': True, 'active': True,
+                                    'precision': {'amount': self.amount_decimals, 'price': self.price_decimals},
+                                    'limits': {'amount': {'min': None}}}
+        if channel.startswith('spot@public.deals'):
+            for deal in data.get('deals') or []:
+                self.prices[symbol] = float(deal['p'])
+                self._match_deal(symbol, float(deal['p']), float(deal['v']))
+        elif channel.startswith('spot@public.bookTicker'):
+            book = self.books.setdefault(symbol, {'bids': [], 'asks': []})
+            if data.get('b'):
+                bid = float(data['b'])
+                book['bids'] = [[bid, float(data['B'])]] + [level for level in book['bids'][1:] if level[0] < bid]
+            if data.get('a'):
+                ask = float(data['a'])
+                book['asks'] = [[ask, float(data['A'])]] + [level for level in book['asks'][1:] if level[0] > ask]
+        elif channel.startswith('spot@public.limit.depth'):
+            self.books[symbol] = {
+                'bids': [[float(level['p']), float(level['v'])] for level in data.get('bids', [])],
+                'asks': [[float(level['p']), float(level['v'])] for level in data.get('asks', [])],
+            }
+
+    def _crosses(self, order, price):
+        return price <= order['price'] if order['side'] == 'buy' else price >= order['price']
+
+    def _fill(self, order, quantity, price):
+        cost = quantity * price
+        fee = cost * self.fee_percentage
+        order['cost'] += cost
+        order['filled'] += quantity
+        order['average'] = order['cost'] / order['filled']
+        sign = 1 if order['side'] == 'buy' else -1
+        self.balance -= sign * cost + fee
+        self.holdings[order['symbol']] = self.holdings.get(order['symbol'], 0.0) + sign * quantity
+        self.fees += fee
+        self.fills.append({'time': asyncio.get_running_loop().time(), 'symbol': order['symbol'], 'side': order['side'],
+                           'quantity': quantity, 'price': price, 'fee': fee, 'order_id': order['id']})
+        if order['amount'] - order['filled'] <= 1e-12:
+            order['status'] = 'closed'
+            self._open.pop(order['id'], None)
+
+    # Execution immediate contre le carnet (preneur), au prix de chaque niveau
+    def _match_book(self, order):
+        book = self.books.get(order['symbol']) or {}
+        for price, volume in book.get('asks' if order['side'] == 'buy' else 'bids') or []:
+            remaining = order['amount'] - order['filled']
+            if remaining <= 1e-12 or not self._crosses(order, price):
+                break
+            self._fill(order, min(volume, remaining), price)
+
+    # Ordres au carnet executes par une transaction qui les croise, au prix limite (faiseur)
+    def _match_deal(self, symbol, price, volume):
+        for order in list(self._open.values()):
+            if volume <= 0:
+                return
+            if order['symbol'] != symbol or not self._crosses(order, price):
+                continue
+            quantity = min(volume, order['amount'] - order['filled'])
+            self._fill(order, quantity, order['price'])
+            volume -= quantity
+
+    async def load(self):
+        await self.reload_markets()
+        return self
+
+    async def reload_markets(self):
+        await self._delay()
+        self.market = dict(self._listed)
+
+    async def get_price(self, pair):
+        return self.prices.get(pair)
+
+    async def get_tickers(self, pairs):
+        return {pair: {'symbol': pair, 'last': self.prices[pair]} for pair in pairs if pair in self.prices}
+
+    async def get_order_book(self, pair):
+        return self.books.get(pair)
+
+    def convert_amount_to_precision(self, symbol, amount):
+        return str(truncate(amount, self.amount_decimals))
+
+    def convert_price_to_precision(self, symbol, price):
+        return str(round(price, self.price_decimals))
+
+    async def get_balance(self):
+        return self.balance
+
+    def get_minimum_trade_amount(self, symbol):
+        return (self.market.get(symbol) or {}).get('limits', {}).get('amount', {}).get('min') or 0.0
+
+    async def place_order(self, symbol, side, quantity, price, detected_at=None, params=None):
+        await self._delay()
+        if symbol not in self._listed:
+            logging.error(f"[BACKTEST] Marche {symbol} inconnu, ordre {side} refuse.")
+            return None
+        if side == 'buy' and quantity * price * (1 + self.fee_percentage) > self.balance:
+            logging.error(f"[BACKTEST] Fonds insuffisants pour {side} {quantity} {symbol}.")
+            return None
+        order = {'id': str(next(self._ids)), 'symbol': symbol, 'side': side, 'price': price, 'amount': quantity,
+                 'filled': 0.0, 'cost': 0.0, 'average': None, 'status': 'open'}
+        self.orders[order['id']] = order
+        self._open[order['id']] = order
+        self._match_book(order)
+        if order['status'] == 'open' and (params or {}).get('timeInForce') == 'IOC':
+            order['status'] = 'canceled'
+            self._open.pop(order['id'], None)
+        return dict(order)
+
+    def supports_native_stops(self, symbol):
+        return False
+
+    async def place_stop_order(self, symbol, quantity, stop_price, price):
+        return None
+
+    async def fetch_order(self, order_id, symbol):
+        await self._delay()
+        order = self.orders.get(order_id)
+        return dict(order) if order else None
+
+    async def cancel_order(self, order_id, symbol):
+        await self._delay()
+        order = self._open.pop(order_id, None)
+        if order is None:
+            return None
+        order['status'] = 'canceled'
+        return dict(order)
+
+    # Resultat: solde final plus les quantites encore detenues, valorisees au dernier prix
+    def report(self):
+        open_value = sum(quantity * self.prices.get(symbol, 0.0) for symbol, quantity in self.holdings.items())
+        bought = sum(fill['quantity'] * fill['price'] for fill in self.fills if fill['side'] == 'buy')
+        pnl = self.balance + open_value - self.initial_balance
+        return {
+            'pnl': pnl,
+            'return_percent': pnl / bought * 100 if bought else 0.0,
+            'fees': self.fees,
+            'fills': len(self.fills),
+            'orders': len(self.orders),
+            'open_value': open_value,
+            'trades': self.fills,
+        }
+
+
+# Les messages sont remis a l'echange puis au flux du bot, a leur horodatage virtuel
+async def replay(messages, feed, exchange):
+    loop = asyncio.get_running_loop()
+    for message in messages:
+        timestamp = message.get('t')
+        if timestamp is not None:
+            delay = timestamp / 1000 - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        exchange.on_message(message)
+        feed.handle_message(message)
+
+
+async def _simulate(messages, symbols, config, latency, jitter, seed, balance, amount_decimals, settle):
+    exchange = FakeExchange(config.get('fee_percentage', 0.001), latency=latency, jitter=jitter, balance=balance,
+                            amount_decimals=amount_decimals, seed=seed)
+    feed = MarketDataFeed(exchange, url='')
+    store = MemoryStore()
+    manager = PairManager(exchange, feed, OrderManager(exchange), store, lambda message, **kwargs: None, config)
+    manager.update_balance(exchange.balance)
+    for symbol in symbols:
+        manager.add(symbol, source="backtest")
+    await replay(messages, feed, exchange)
+    # Laisser les ordres en cours se terminer, puis arreter toutes les taches
+    await asyncio.sleep(settle)
+    current = asyncio.current_task()
+    tasks = [task for task in asyncio.all_tasks() if task is not current]
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    result = exchange.report()
+    result['states'] = {snipe.symbol: snipe.state.value for snipe in manager.snipes.values()}
+    result['traded_pairs'] = list(store.traded_pairs)
+    return result
+
+
+# Un backtest complet sur sa propre boucle a horloge virtuelle
+def run_backtest(messages, symbols, config, latency=0.05, jitter=0.0, seed=0, balance=1000.0, amount_decimals=2, settle=60):
+    started = time.perf_counter()
+    timestamps = [message['t'] for message in messages if message.get('t') is not None]
+    start = timestamps[0] / 1000 if timestamps else 0.0
+    loop = VirtualClockLoop(start)
+    try:
+        result = loop.run_until_complete(_simulate(messages, symbols, config, latency, jitter, seed, balance, amount_decimals, settle))
+    finally:
+        loop.close()
+    result['simulated_seconds'] = (timestamps[-1] - timestamps[0]) / 1000 if timestamps else 0.0
+    result['wall_seconds'] = time.perf_counter() - started
+    result['messages'] = len(messages)
+    return result
+
+
+# Symboles presents dans un enregistrement, sous leur forme unifiee
+def recorded_symbols(messages):
+    symbols = []
+    for message in messages:
+        channel = message.get('c') or ''
+        if channel.startswith('spot@public') and message.get('d') is not None:
+            symbol = unified_symbol(message.get('s') or channel.split('@')[2])
+            if symbol not in symbols:
+                symbols.append(symbol)
+    return symbols
+
+
+# "cle=v1,v2" -> {'cle': [v1, v2]}, chaque valeur lue en JSON si possible
+def parse_grid(specs):
+    grid = {}
+    for spec in specs:
+        key, _, values = spec.partition('=')
+        parsed = []
+        for value in values.split(','):
+            try:
+                parsed.append(json.loads(value))
+            except ValueError:
+                parsed.append(value)
+        grid[key] = parsed
+    return grid
+
+
+def expand_grid(grid):
+    keys = list(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[key] for key in keys))]
+
+
+# Messages charges une seule fois par processus du pool
+_worker_messages = None
+
+
+def _init_worker(file_path, level):
+    global _worker_messages
+    logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=level)
+    _worker_messages = load_messages(file_path)
+
+
+def _run_worker(args):
+    symbols, config, options = args
+    return run_backtest(_worker_messages, symbols, config, **options)
+
+
+# Un backtest par combinaison de parametres, en parallele; resultats tries par PnL decroissant
+def sweep(file_path, symbols, base_config, grid, processes=None, **options):
+    combinations = expand_grid(grid)
+    jobs = [(symbols, dict(base_config, **params), options) for params in combinations]
+    with ProcessPoolExecutor(processes, initializer=_init_worker, initargs=(file_path, logging.getLogger().level)) as pool:
+        results = list(pool.map(_run_worker, jobs))
+    for params, result in zip(combinations, results):
+        result['params'] = params
+    return sorted(results, key=lambda result: result['pnl'], reverse=True)
+
+
+def print_result(result):
+    params = " ".join(f"{key}={value}" for key, value in result.get('params', {}).items())
+    print(f"{params or 'config'} | PnL {result['pnl']:.4f} USDT ({result['return_percent']:.2f}%) | frais {result['fees']:.4f} | "
+          f"{result['fills']} executions, {result['orders']} ordres | {result['simulated_seconds']:.0f}s simulees en {result['wall_seconds']:.2f}s")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Backtest du sniping et des stops sur un flux MEXC enregistre")
+    parser.add_argument('file', help="fichier JSONL de messages bruts MEXC, ou repertoire d'archive de recorder.py")
+    parser.add_argument('--symbol', action='append', help="paire a sniper (par defaut: toutes celles de l'enregistrement)")
+    parser.add_argument('--config', default='config.json', help="configuration de la strategie (cles de config.json)")
+    parser.add_argument('--latency', type=float, default=0.05, help="latence de chaque requete a l'echange, en secondes")
+    parser.add_argument('--jitter', type=float, default=0.0, help="latence aleatoire supplementaire maximale, en secondes")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--balance', type=float, default=1000.0, help="solde USDT initial")
+    parser.add_argument('--amount-decimals', type=int, default=2, help="precision des quantites des marches simules")
+    parser.add_argument('--sweep', nargs='*', default=[], metavar='CLE=V1,V2', help="parametres a balayer")
+    parser.add_argument('--processes', type=int, default=None)
+    parser.add_argument('--output', help="fichier JSON des resultats")
+    parser.add_argument('-v', '--verbose', action='store_true')
+    args = parser.parse_args()
+    logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+                        level=logging.INFO if args.verbose else logging.WARNING)
+
+    base_config = {}
+    if os.path.exists(args.config):
+        with open(args.config, 'r') as f:
+            base_config = json.load(f)
+    base_config.setdefault('usdt_amount', 12)
+    options = {'latency': args.latency, 'jitter': args.jitter, 'seed': args.seed, 'balance': args.balance,
+               'amount_decimals': args.amount_decimals}
+    if args.sweep:
+        symbols = args.symbol or recorded_symbols(load_messages(args.file))
+        results = sweep(args.file, symbols, base_config, parse_grid(args.sweep), args.processes, **options)
+    else:
+        messages = load_messages(args.file)
+        results = [run_backtest(messages, args.symbol or recorded_symbols(messages), base_config, **options)]
+    for result in results:
+        print_result(result)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,420 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+import bot_snip
+from backtest import MemoryStore
+from exchange_clients import registry
+from listing_watch import ListingWatch
+from market_stream import DEALS_CHANNEL, MarketDataFeed
+from metrics import metrics
+from mock_exchange import MEXC_V2_PATH, MockExchange
+from order_manager import OrderManager
+from pair_manager import PairManager
+from pricing import PricingService
+from telegram_notifier import TRADE, TelegramNotifier
+from telegram_updates import TelegramUpdates
+
+# Benchmarks de bout en bout contre MockExchange (REST et WebSocket MEXC, API Telegram) dans le
+# meme processus. Le bot tourne avec ses vrais composants (SpotExchange et ccxt, MarketDataFeed,
+# OrderManager, PairManager, TelegramNotifier); seuls l'echange et Telegram sont simules.
+# Scenarios:
+#   listing         listing scripte -> ordre d'achat recu, execution -> position, stop -> ordre de vente
+#   throughput      transactions par seconde traitees avec N paires en position, retard de la boucle
+#   session         memoire, threads et taches pendant une longue session de stops suiveurs
+#   telegram        cout de telegram_send, debit et latence des notifications et des commandes
+#   exchange_calls  quantiles des appels SpotExchange (exchange_call_seconds) sur tous les scenarios
+# Le resultat est un JSON; --baseline compare a un resultat precedent et sort en erreur si une
+# mesure se degrade de plus de --tolerance.
+
+BENCH_CONFIG = {
+    'usdt_amount': 10,
+    'fee_percentage': 0.001,
+    'listing_poll_interval': 1,
+    'stop_trailing_percent': 0.02,
+    'order_timeout': 10,
+}
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(int(q * len(values)), len(values) - 1)]
+
+
+def describe(values, scale=1000):
+    if not values:
+        return {}
+    return {'p50': percentile(values, 0.5) * scale, 'p99': percentile(values, 0.99) * scale,
+            'max': max(values) * scale, 'mean': statistics.mean(values) * scale, 'count': len(values)}
+
+
+def rss_mb():
+    with open('/proc/self/statm', 'r') as f:
+        pages = int(f.read().split()[1])
+    return pages * os.sysconf('SC_PAGE_SIZE') / 1024 / 1024
+
+
+# Journal en memoire qui horodate les changements de position, pour mesurer execution -> position
+class BenchStore(MemoryStore):
+    def __init__(self):
+        super().__init__()
+        self.events = []
+        self._changed = asyncio.Event()
+
+    def _event(self, kind, symbol):
+        self.events.append((kind, symbol, time.perf_counter()))
+        self._changed.set()
+
+    def save_position(self, symbol, buy_price, quantity, venue=None):
+        super().save_position(symbol, buy_price, quantity, venue)
+        self._event('position', symbol)
+
+    def clear_position(self, symbol):
+        super().clear_position(symbol)
+        self._event('closed', symbol)
+
+    async def wait(self, kind, symbol, timeout=30):
+        deadline = time.perf_counter() + timeout
+        while True:
+            for event_kind, event_symbol, at in self.events:
+                if event_kind == kind and event_symbol == symbol:
+                    return at
+            self._changed.clear()
+            await asyncio.wait_for(self._changed.wait(), max(deadline - time.perf_counter(), 0))
+
+
+# Sonde du retard de la boucle asyncio: ecart entre le reveil prevu et le reveil reel
+class LagProbe():
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.samples = []
+
+    async def run(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(time.perf_counter() - start - self.interval, 0))
+
+
+# Le bot complet branche sur l'echange simule
+class Bench():
+    def __init__(self, mock, config=None, positions=()):
+        self.mock = mock
+        self.config = dict(BENCH_CONFIG, **(config or {}))
+        self.positions = positions
+        self.tasks = []
+
+    async def start(self):
+        mock = self.mock
+        bot_snip.notifier = TelegramNotifier('bench', 1, min_interval=0, status_interval=1, api_url=mock.http_url)
+        self.exchange = bot_snip.SpotExchange('mexc', apiKey='bench', secret='bench')
+        base = mock.http_url + MEXC_V2_PATH
+        self.exchange._session.urls['api']['spot'] = {'public': base, 'private': base}
+        await self.exchange.load()
+        self.listings = ListingWatch('mexc', url=mock.http_url + '/api/v3/defaultSymbols', interval=0.2, known=mock.markets)
+        self.store = BenchStore()
+        for symbol, buy_price, quantity in self.positions:
+            self.store.save_position(symbol, buy_price, quantity)
+        pricing = PricingService(self.exchange)
+        self.feed = MarketDataFeed(self.exchange, url=mock.url, pricing=pricing)
+        self.orders = OrderManager(self.exchange)
+        self.manager = PairManager(self.exchange, self.feed, self.orders, self.store, bot_snip.telegram_send, self.config,
+                                   pricing=pricing, listings=self.listings)
+        self.listings.add_listener(self.manager.on_listing)
+        self.manager.update_balance(await self.exchange.get_balance())
+        self.tasks = [asyncio.create_task(coro) for coro in
+                      (bot_snip.notifier.run(), self.feed.run(), self.listings.run())]
+        self.manager.restore()
+        return self
+
+    async def stop(self):
+        for snipe in list(self.manager.snipes.values()):
+            snipe.task.cancel()
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, *(snipe.task for snipe in self.manager.snipes.values()), return_exceptions=True)
+        bot_snip.notifier = None
+        await registry.close()
+
+
+async def with_bench(scenario, mock_options=None, **bench_options):
+    mock = MockExchange(**(mock_options or {}))
+    await mock.start()
+    bench = None
+    try:
+        for symbol, buy_price, quantity in bench_options.get('positions', ()):
+            mock.add_market(symbol, buy_price)
+        bench = await Bench(mock, **bench_options).start()
+        return await scenario(mock, bench)
+    finally:
+        if bench is not None:
+            await bench.stop()
+        await mock.stop()
+
+
+# Listing scripte: le marche apparait (REST) et ses premiers echanges sont publies sur le flux
+async def listing_scenario(mock, bench, runs=5):
+    detection, fill, stop = [], [], []
+    for run in range(runs):
+        symbol = f"BENCH{run}/USDT"
+        bench.manager.add(symbol)
+        await mock.wait_subscription(DEALS_CHANNEL.format(symbol.replace('/', '')))
+        listed_at = await mock.list_market(symbol, 1.0)
+        buy = await mock.wait_order(symbol, 'buy')
+        detection.append(buy['received_at'] - listed_at)
+        position_at = await bench.store.wait('position', symbol)
+        fill.append(position_at - buy['filled_at'])
+        # Premiere transaction au prix d'achat pour initialiser le stop, puis chute sous le stop suiveur
+        await mock.publish_deal(symbol, 1.0)
+        await asyncio.sleep(0.05)
+        dropped_at = time.perf_counter()
+        await mock.publish_deal(symbol, 0.9)
+        sell = await mock.wait_order(symbol, 'sell')
+        stop.append(sell['received_at'] - dropped_at)
+        await bench.store.wait('closed', symbol)
+        # Les rechargements forces de marches sont espaces d'au moins une seconde
+        await asyncio.sleep(1.1)
+    return {'detection_to_order_ms': describe(detection), 'fill_to_position_ms': describe(fill),
+            'stop_to_order_ms': describe(stop)}
+
+
+def holding_positions(pairs):
+    return [(f"HOLD{index}/USDT", 1.0, 10.0) for index in range(pairs)]
+
+
+async def wait_subscriptions(mock, symbols):
+    for symbol in symbols:
+        await mock.wait_subscription(DEALS_CHANNEL.format(symbol.replace('/', '')))
+
+
+# Prix montants par petits pas: le stop suiveur suit sans se declencher
+async def publish_ticks(mock, symbols, messages, step=0.0001):
+    prices = {symbol: 1.0 for symbol in symbols}
+    for index in range(messages):
+        symbol = symbols[index % len(symbols)]
+        prices[symbol] = round(prices[symbol] + step, 6)
+        await mock.publish_deal(symbol, prices[symbol])
+        if index % 100 == 99:
+            await asyncio.sleep(0)
+
+
+async def throughput_scenario(mock, bench, messages=20000):
+    symbols = [symbol for symbol, _, _ in bench.positions]
+    await wait_subscriptions(mock, symbols)
+    received = []
+    bench.feed.add_listener(lambda symbol, price: received.append(time.perf_counter()))
+    probe = LagProbe()
+    probe_task = asyncio.create_task(probe.run())
+    start = time.perf_counter()
+    try:
+        await publish_ticks(mock, symbols, messages)
+        deadline = time.perf_counter() + 30
+        while len(received) < messages and time.perf_counter() < deadline:
+            await asyncio.sleep(0.01)
+    finally:
+        probe_task.cancel()
+    elapsed = (received[-1] if received else time.perf_counter()) - start
+    return {'pairs': len(symbols), 'messages': messages, 'received': len(received),
+            'messages_per_second': len(received) / elapsed if elapsed > 0 else None,
+            'loop_lag_ms': describe(probe.samples)}
+
+
+# Session longue: ticks continus sur toutes les paires, echantillons de memoire/threads/taches
+async def session_scenario(mock, bench, duration=60, rate=200):
+    symbols = [symbol for symbol, _, _ in bench.positions]
+    await wait_subscriptions(mock, symbols)
+    samples = []
+
+    def sample():
+        samples.append({'rss_mb': rss_mb(), 'threads': threading.active_count(), 'tasks': len(asyncio.all_tasks())})
+
+    sample()
+    sent_before = bot_snip.notifier.sent
+    end = time.perf_counter() + duration
+    next_sample = time.perf_counter() + 1
+    while time.perf_counter() < end:
+        await publish_ticks(mock, symbols, max(int(rate / 10), 1), step=0.00001)
+        await asyncio.sleep(0.1)
+        if time.perf_counter() >= next_sample:
+            sample()
+            next_sample += 1
+    sample()
+    return {'duration_seconds': duration, 'pairs': len(symbols),
+            'rss_mb': {'start': samples[0]['rss_mb'], 'end': samples[-1]['rss_mb'], 'peak': max(s['rss_mb'] for s in samples)},
+            'rss_growth_mb': samples[-1]['rss_mb'] - samples[0]['rss_mb'],
+            'threads_peak': max(s['threads'] for s in samples),
+            'tasks_peak': max(s['tasks'] for s in samples),
+            'tasks_growth': samples[-1]['tasks'] - samples[0]['tasks'],
+            'telegram_sent': bot_snip.notifier.sent - sent_before,
+            'telegram_dropped': bot_snip.notifier.dropped}
+
+
+async def telegram_scenario(mock, bench, messages=200, commands=20):
+    # Cout de l'appel sur le chemin critique: mise en file, sans requete HTTP
+    calls = 10000
+    start = time.perf_counter()
+    for index in range(calls):
+        bot_snip.telegram_send(f"statut {index}", priority=2, key=f"k{index % 10}")
+    us_per_call = (time.perf_counter() - start) / calls * 1e6
+
+    received_before = len(mock.telegram_messages)
+    sent_at = {}
+    start = time.perf_counter()
+    for index in range(messages):
+        text = f"bench {index}"
+        sent_at[text] = time.perf_counter()
+        bot_snip.telegram_send(text, priority=TRADE)
+    deadline = time.perf_counter() + 30
+    while len(mock.telegram_messages) - received_before < messages and time.perf_counter() < deadline:
+        await asyncio.sleep(0.005)
+    delivered = [(at, text) for at, text in mock.telegram_messages[received_before:] if text in sent_at]
+    elapsed = (delivered[-1][0] - start) if delivered else None
+
+    # Commandes recues par long polling
+    handled = []
+    updates = TelegramUpdates('bench', 1, offset_file=os.path.join(tempfile.mkdtemp(), 'offset.json'),
+                              timeout=5, retry_interval=1, api_url=mock.http_url)
+
+    async def handler(text):
+        handled.append((text, time.perf_counter()))
+
+    poller = asyncio.create_task(updates.run(handler))
+    command_latency = []
+    try:
+        for index in range(commands):
+            text = f"/paires {index}"
+            pushed_at = mock.push_command(text, 1)
+            while not any(handled_text == text for handled_text, _ in handled):
+                await asyncio.sleep(0.001)
+            command_latency.append(handled[-1][1] - pushed_at)
+    finally:
+        poller.cancel()
+    return {'send_us_per_call': us_per_call, 'delivered': len(delivered),
+            'messages_per_second': len(delivered) / elapsed if elapsed else None,
+            'send_latency_ms': describe([at - sent_at[text] for at, text in delivered]),
+            'command_latency_ms': describe(command_latency)}
+
+
+def exchange_call_stats():
+    stats = {}
+    for (name, labels), summary in sorted(metrics.summaries.items()):
+        if name == 'exchange_call_seconds':
+            method = dict(labels).get('method')
+            stats[method] = {'p50_ms': summary.quantile(0.5) * 1000, 'p99_ms': summary.quantile(0.99) * 1000}
+    return stats
+
+
+SCENARIOS = ('listing', 'throughput', 'session', 'telegram')
+
+
+async def run_benchmarks(scenarios, runs=5, pairs=20, messages=20000, session=60):
+    metrics.enabled = True
+    results = {}
+    for scenario in scenarios:
+        logging.info(f"Scenario {scenario}...")
+        started = time.perf_counter()
+        if scenario == 'listing':
+            results[scenario] = await with_bench(lambda mock, bench: listing_scenario(mock, bench, runs))
+        elif scenario == 'throughput':
+            results[scenario] = await with_bench(lambda mock, bench: throughput_scenario(mock, bench, messages),
+                                                 positions=holding_positions(pairs))
+        elif scenario == 'session':
+            results[scenario] = await with_bench(lambda mock, bench: session_scenario(mock, bench, session),
+                                                 positions=holding_positions(pairs))
+        elif scenario == 'telegram':
+            results[scenario] = await with_bench(telegram_scenario)
+        logging.info(f"Scenario {scenario} termine en {time.perf_counter() - started:.1f}s.")
+    results['exchange_calls'] = exchange_call_stats()
+    return results
+
+
+# Mesures comparables, a plat: "scenario.mesure.statistique" -> valeur
+def flatten(results, prefix=''):
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, name + '.'))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+# Sens d'une mesure: 1 si plus haut est meilleur, -1 si plus bas est meilleur, 0 si non comparee
+def direction(name):
+    if 'per_second' in name:
+        return 1
+    if name.endswith('.count') or name.endswith('.max'):
+        return 0
+    if '_ms' in name or '_mb' in name or 'us_per_call' in name or 'growth' in name:
+        return -1
+    return 0
+
+
+# min_change: ecart absolu minimal (ms, Mo, us...) pour ignorer le bruit des mesures tres courtes
+def compare(results, baseline, tolerance=0.25, min_change=1.0):
+    current, previous = flatten(results), flatten(baseline)
+    regressions = []
+    for name, value in sorted(current.items()):
+        sign = direction(name)
+        reference = previous.get(name)
+        if not sign or not reference or reference <= 0:
+            continue
+        change = (value - reference) / reference * sign
+        if change < -tolerance and abs(value - reference) >= min_change:
+            regressions.append({'metric': name, 'baseline': reference, 'current': value, 'change': change})
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks du bot contre un echange MEXC et un Telegram simules")
+    parser.add_argument('--scenario', action='append', choices=SCENARIOS, help="scenario a executer (defaut: tous)")
+    parser.add_argument('--runs', type=int, default=5, help="nombre de listings scriptes")
+    parser.add_argument('--pairs', type=int, default=20, help="paires en position pour throughput et session")
+    parser.add_argument('--messages', type=int, default=20000, help="transactions publiees pour throughput")
+    parser.add_argument('--session', type=float, default=60, help="duree de la session de stops suiveurs, en secondes")
+    parser.add_argument('--output', help="fichier JSON des resultats (defaut: sortie standard)")
+    parser.add_argument('--baseline', help="resultat precedent a comparer")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="degradation relative toleree par mesure")
+    parser.add_argument('--min-change', type=float, default=1.0, help="ecart absolu minimal pour signaler une regression")
+    parser.add_argument('-v', '--verbose', action='store_true')
+    args = parser.parse_args(argv)
+    logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+                        level=logging.INFO if args.verbose else logging.WARNING)
+    logging.getLogger('aiohttp.access').setLevel(logging.WARNING)
+
+    output_file = os.path.abspath(args.output) if args.output else None
+    baseline_file = os.path.abspath(args.baseline) if args.baseline else None
+    # Fichiers du bot (offset Telegram...) dans un repertoire temporaire
+    os.chdir(tempfile.mkdtemp(prefix='bench-'))
+    started = time.time()
+    results = asyncio.run(run_benchmarks(args.scenario or SCENARIOS, args.runs, args.pairs, args.messages, args.session))
+    report = {'started_at': started, 'python': sys.version.split()[0], 'results': results}
+    status = 0
+    if baseline_file:
+        with open(baseline_file, 'r') as f:
+            baseline = json.load(f)
+        report['regressions'] = compare(results, baseline.get('results', baseline), args.tolerance, args.min_change)
+        for regression in report['regressions']:
+            logging.error(f"Regression {regression['metric']}: {regression['baseline']:.4g} -> {regression['current']:.4g}")
+        status = 1 if report['regressions'] else 0
+    output = json.dumps(report, indent=2)
+    if output_file:
+        with open(output_file, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,82 +1,144 @@
+import asyncio
 import json
 import logging
 import ccxt
-import requests
 import time
 from datetime import datetime, timedelta
-import threading
 import os
-from functools import wraps
+from functools import partial, wraps
 import sys
 
-# Charger les configurations depuis config.json
-with open('config.json', 'r') as f:
-    config = json.load(f)
-
-exchange_auth = config['exchange_auth']
-bot_token = config['bot_token']
-bot_chatID = config['bot_chatID']
-usdt_amount = config['usdt_amount']  # Ajouter cette ligne pour récupérer usdt_amount
-
-# Initialiser la variable de la paire à trader
-current_pair = ''
-
-# Fichier pour sauvegarder l'etat de la position ouverte
+from atomic_file import save_json
+from exchange_clients import registry
+from listing_watch import MEXC_SYMBOLS_URL, ListingWatch
+from log_pipeline import event, setup_logging
+from market_cache import MarketCache
+from market_stream import MEXC_WS_URL, MarketDataFeed, UserDataStream
+from metrics import metrics
+from order_manager import OrderManager
+from pair_manager import PairManager
+from positions import PositionStore
+from pricing import PricingService
+from recorder import MarketRecorder
+from telegram_notifier import INFO, TRADE, TelegramNotifier
+from telegram_updates import TelegramUpdates
+from venues import Venue, VenuePool
+
+# Importer ce module n'a aucun effet de bord: la configuration est lue par configure(),
+# et les fichiers, le journal, les clients et les taches ne sont crees que par main().
+
+# Configuration lue depuis config.json par configure()
+config = None
+exchange_auth = None
+bot_token = None
+bot_chatID = None
+usdt_amount = None
+telegram_poll_interval = 10
+telegram_long_poll_timeout = 30
+telegram_status_interval = 10
+listing_poll_interval = 1
+balance_refresh_interval = 30
+listing_watch_interval = 5
+# Echanges sans liste legere des symboles: la liste complete des marches est retelechargee, moins souvent
+listing_watch_markets_interval = 60
+metrics_port = 0
+auto_arm_patterns = []
+market_cache_ttl = 3600
+record_market_data = False
+record_directory = 'records'
+record_chunk_seconds = 3600
+# Echanges surveilles en plus de exchange_name: liste de {"name", "apiKey", "secret"} (noms ccxt)
+exchanges = []
+# Fenetre (s) pendant laquelle les echanges qui listent la meme paire sont compares avant d'acheter
+venue_route_window = 0
+# Journalisation par file et thread d'ecriture: niveau, sortie JSON, fichier optionnel, echantillonnage (s)
+log_level = 'INFO'
+log_json = False
+log_file = ''
+log_sample_interval = 10
+
+# Journal des positions et des ordres; les anciens fichiers JSON sont importes au premier demarrage
+journal_file = 'journal.db'
 open_position_file = 'open_position.json'
+traded_pairs_file = 'traded_pairs.json'
 
-# Configuration du logging
-logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO)
-
-# Variable pour stocker le dernier message Telegram envoyé
-last_telegram_message = None
-
-# Fonction pour envoyer des messages via Telegram avec vérification de répétition
-def telegram_send(message):
-    global last_telegram_message
-    if message != last_telegram_message:
-        send_text = f'https://api.telegram.org/bot{bot_token}/sendMessage?chat_id={bot_chatID}&parse_mode=Markdown&text={message}'
-        threading.Thread(target=requests.get, args=(send_text,)).start()
-        last_telegram_message = message
-
-def retry(exceptions, tries=5, delay=3, backoff=2):
-    def deco_retry(f):
-        @wraps(f)
-        def f_retry(*args, **kwargs):
-            mtries, mdelay = tries, delay
-            while mtries > 1:
-                try:
-                    return f(*args, **kwargs)
-                except exceptions as e:
-                    logging.warning(f"{e}, Retrying in {mdelay} seconds...")
-                    time.sleep(mdelay)
-                    mtries -= 1
-                    mdelay *= backoff
-            return f(*args, **kwargs)
-        return f_retry
-    return deco_retry
+# Metadonnees des marches (precision, limites, statut) gardees entre deux demarrages
+markets_cache_file = 'markets_cache.json'
+
+# File d'envoi des notifications Telegram (une seule tache et une seule session HTTP)
+notifier = None
+
+def configure(config_file='config.json'):
+    global config, exchange_auth, bot_token, bot_chatID, usdt_amount, telegram_poll_interval, telegram_long_poll_timeout
+    global telegram_status_interval, listing_poll_interval, balance_refresh_interval, listing_watch_interval, listing_watch_markets_interval
+    global metrics_port, auto_arm_patterns, market_cache_ttl, ws_url
+    global record_market_data, record_directory, record_chunk_seconds, exchanges, venue_route_window
+    global log_level, log_json, log_file, log_sample_interval
+    with open(config_file, 'r') as f:
+        config = json.load(f)
+
+    exchange_auth = config['exchange_auth']
+    bot_token = config['bot_token']
+    bot_chatID = config['bot_chatID']
+    usdt_amount = config['usdt_amount']  # Ajouter cette ligne pour récupérer usdt_amount
+    telegram_poll_interval = config.get('telegram_poll_interval', 10)
+    telegram_long_poll_timeout = config.get('telegram_long_poll_timeout', 30)
+    telegram_status_interval = config.get('telegram_status_interval', 10)
+    listing_poll_interval = config.get('listing_poll_interval', 1)
+    balance_refresh_interval = config.get('balance_refresh_interval', 30)
+    listing_watch_interval = config.get('listing_watch_interval', 5)
+    listing_watch_markets_interval = config.get('listing_watch_markets_interval', 60)
+    metrics_port = config.get('metrics_port', 0)
+    auto_arm_patterns = config.get('auto_arm_patterns', [])
+    market_cache_ttl = config.get('market_cache_ttl', 3600)
+    record_market_data = config.get('record_market_data', False)
+    record_directory = config.get('record_directory', 'records')
+    record_chunk_seconds = config.get('record_chunk_seconds', 3600)
+    exchanges = config.get('exchanges', [])
+    venue_route_window = config.get('venue_route_window', 0)
+    log_level = config.get('log_level', 'INFO')
+    log_json = config.get('log_json', False)
+    log_file = config.get('log_file', '')
+    log_sample_interval = config.get('log_sample_interval', 10)
+    ws_url = config.get('ws_url', MEXC_WS_URL if exchange_name == "mexc" else '')
+    return config
+
+# Fonction pour envoyer des messages via Telegram, sans jamais attendre la requete HTTP;
+# les statuts portant une cle sont fusionnes en un resume periodique
+def telegram_send(message, priority=INFO, key=None):
+    if notifier is None:
+        logging.info(f"Telegram non configure, message non envoye: {message}")
+        return
+    notifier.send(message, priority=priority, key=key)
 
 def authentication_required(fn):
     @wraps(fn)
-    def wrapped(self, *args, **kwargs):
+    async def wrapped(self, *args, **kwargs):
         if not self._auth:
             message = "You must be authenticated to use this method"
             logging.error(message)
             telegram_send(message)
             sys.exit(1)
-        return fn(self, *args, **kwargs)
+        return await fn(self, *args, **kwargs)
     return wrapped
 
+# Mesure le temps entre la detection du prix et l'envoi de l'ordre
+def log_order_latency(symbol, side, detected_at):
+    if detected_at is not None:
+        latency = time.perf_counter() - detected_at
+        metrics.observe('detection_to_order_seconds', latency, side=side)
+        logging.info("Latence detection -> envoi de l'ordre %s %s: %.1f ms", side, symbol, latency * 1000,
+                     extra=event('order_latency', symbol=symbol, side=side, stage='order', ms=latency * 1000))
+
 class SpotExchange():
     def __init__(self, exchange_name, apiKey=None, secret=None, dry_run=False):
         self.exchange_name = exchange_name
         self._auth = secret is not None
         self.dry_run = dry_run
+        self.market = None
         try:
-            self._session = getattr(ccxt, exchange_name)({
-                "apiKey": apiKey,
-                "secret": secret,
-            }) if self._auth else getattr(ccxt, exchange_name)()
-            self.market = self._session.load_markets()
+            # Client partage via le registre: une seule session HTTP et des marches charges une fois
+            self._session = registry.get(exchange_name, apiKey, secret) if self._auth else registry.get(exchange_name)
             if exchange_name == "mexc":
                 self._session.options['createMarketBuyOrderRequiresPrice'] = False
 
@@ -85,38 +147,65 @@ class SpotExchange():
             telegram_send(f"Erreur critique lors de l'initialisation de l'API pour {exchange_name}: {e}")
             raise
 
-    def reload_markets(self):
-        self.market = self._session.load_markets()
+    # Les marches sont charges de maniere asynchrone, apres la creation de l'objet
+    @metrics.timed('exchange_call_seconds')
+    async def load(self):
+        try:
+            self.market = await registry.load_markets(self.exchange_name)
+        except Exception as e:
+            logging.error(f"Erreur lors du chargement des marches pour {self.exchange_name}: {e}")
+            telegram_send(f"Erreur critique lors du chargement des marches pour {self.exchange_name}: {e}")
+            raise
+        return self
 
-    def get_price(self, pair):
+    @metrics.timed('exchange_call_seconds')
+    async def reload_markets(self):
+        self.market = await registry.load_markets(self.exchange_name, reload=True)
+
+    @metrics.timed('exchange_call_seconds')
+    async def get_price(self, pair):
         try:
-            return self._session.fetch_ticker(pair)['last']
+            return (await self._session.fetch_ticker(pair))['last']
         except Exception as e:
             logging.error(f"Erreur lors de la recuperation du prix pour {pair}: {e}")
             return None
 
-    def get_order_book(self, pair):
+    # Un seul appel fetch_tickers pour tous les symboles demandes
+    @metrics.timed('exchange_call_seconds')
+    async def get_tickers(self, pairs):
         try:
-            return self._session.fetch_order_book(pair)
+            return await self._session.fetch_tickers(pairs)
+        except Exception as e:
+            logging.error(f"Erreur lors de la recuperation des tickers pour {len(pairs)} paires: {e}")
+            return {}
+
+    @metrics.timed('exchange_call_seconds')
+    async def get_order_book(self, pair):
+        try:
+            return await self._session.fetch_order_book(pair)
         except Exception as e:
             logging.error(f"Erreur lors de la recuperation de l'order book pour {pair}: {e}")
             return None
 
+    @metrics.timed('exchange_call_seconds')
     def convert_amount_to_precision(self, symbol, amount):
         return self._session.amount_to_precision(symbol, amount)
 
+    @metrics.timed('exchange_call_seconds')
     def convert_price_to_precision(self, symbol, price):
         return self._session.price_to_precision(symbol, price)
 
-    def get_balance(self):
+    @metrics.timed('exchange_call_seconds')
+    async def get_balance(self):
         try:
-            balance = self._session.fetch_balance()
+            balance = await self._session.fetch_balance()
             usdt_balance = balance['free'].get('USDT', 0)
             return float(usdt_balance)
         except Exception as e:
             logging.error(f"Erreur lors de la recuperation du solde: {e}")
             return 0.0
 
+    @metrics.timed('exchange_call_seconds')
     def get_minimum_trade_amount(self, symbol):
         try:
             market = self._session.market(symbol)
@@ -125,137 +214,85 @@ class SpotExchange():
             logging.error(f"Erreur lors de la recuperation du montant minimum pour {symbol}: {e}")
             return 0.0
 
+    @metrics.timed('exchange_call_seconds')
     @authentication_required
-    def place_order(self, symbol, side, quantity, price):
+    async def place_order(self, symbol, side, quantity, price, detected_at=None, params=None):
         if self.dry_run:
-            logging.info(f"[DRY RUN] {side} order of {quantity} {symbol} at {price} USDT would be placed.")
+            log_order_latency(symbol, side, detected_at)
+            logging.info("[DRY RUN] %s order of %s %s at %s USDT would be placed.", side, quantity, symbol, price)
             return None
         try:
-            order = self._session.create_order(symbol, 'limit', side, quantity, price)
-            logging.info(f"Order response: {order}")
-            order_id = order['id']
-            
-            # Verifier l'etat de l'ordre
-            while True:
-                order_status = self._session.fetch_order(order_id, symbol)
-                if order_status['status'] == 'closed':
-                    logging.info(f"Order {order_id} for {symbol} has been executed.")
-                    break
-                logging.info(f"Order {order_id} for {symbol} is still open. Waiting...")
-                time.sleep(5)
-
+            log_order_latency(symbol, side, detected_at)
+            order = await self._session.create_order(symbol, 'limit', side, quantity, price, params or {})
+            if detected_at is not None:
+                latency = time.perf_counter() - detected_at
+                metrics.observe('detection_to_ack_seconds', latency, side=side)
+                logging.info("Latence detection -> accuse de l'ordre %s %s: %.1f ms", side, symbol, latency * 1000,
+                             extra=event('order_latency', symbol=symbol, side=side, stage='ack', ms=latency * 1000))
+            # La reponse complete de l'echange n'est ecrite qu'en DEBUG
+            logging.info("Ordre %s %s %s envoye: %s a %s", order.get('id'), side, symbol, quantity, price,
+                         extra=event('order', symbol=symbol, side=side, order_id=order.get('id'), amount=quantity, price=price))
+            logging.debug("Order response: %s", order)
+            # Le suivi de l'execution est fait par OrderManager, sans bloquer ici
             return order
         except ccxt.InsufficientFunds as e:
             logging.error(f"Fonds insuffisants pour {side} {quantity} {symbol}: {e}")
-            telegram_send(f"Fonds insuffisants pour {side} {quantity} {symbol}: {e}")
+            telegram_send(f"Fonds insuffisants pour {side} {quantity} {symbol}: {e}", priority=TRADE)
         except ccxt.ExchangeError as e:
             logging.error(f"Erreur d'echange lors du placement de l'ordre marche pour {symbol}: {e}")
-            telegram_send(f"Erreur d'echange lors du placement de l'ordre marche pour {symbol}: {e}")
+            telegram_send(f"Erreur d'echange lors du placement de l'ordre marche pour {symbol}: {e}", priority=TRADE)
         except ValueError as e:
             logging.error(f"Erreur de valeur pour l'ordre marche: {e}")
-            telegram_send(f"Erreur de valeur pour l'ordre marche: {e}")
+            telegram_send(f"Erreur de valeur pour l'ordre marche: {e}", priority=TRADE)
         except Exception as e:
             logging.error(f"Erreur inattendue lors du placement de l'ordre marche pour {symbol}: {e}")
-            telegram_send(f"Erreur inattendue lors du placement de l'ordre marche pour {symbol}: {e}")
+            telegram_send(f"Erreur inattendue lors du placement de l'ordre marche pour {symbol}: {e}", priority=TRADE)
         return None
 
-def save_open_position(symbol, buy_price, quantity):
-    with open(open_position_file, 'w') as f:
-        json.dump({'symbol': symbol, 'buy_price': buy_price, 'quantity': quantity}, f)
-    logging.info(f"Position ouverte sauvegardee: {symbol} à {buy_price} USDT pour {quantity} unites.")
-
-def load_open_position():
-    if os.path.exists(open_position_file) and os.path.getsize(open_position_file) > 0:
-        with open(open_position_file, 'r') as f:
-            return json.load(f)
-    return None
-
-def clear_open_position():
-    if os.path.exists(open_position_file):
-        os.remove(open_position_file)
-    logging.info("Position ouverte efface.")
-
-def get_second_bid_ask(exchange, symbol):
-    order_book = exchange.get_order_book(symbol)
-    if order_book:
-        second_bid = order_book['bids'][1][0] if len(order_book['bids']) > 1 else None
-        second_ask = order_book['asks'][1][0] if len(order_book['asks']) > 1 else None
-        return second_bid, second_ask
-    return None, None
-
-def trailing_stop(symbol, exchange, buy_price, quantity):
-    ath = exchange.get_price(symbol)
-    if ath is None:
-        return
-
-    trailing_stop_value = ath * 0.99
-    logging.info(f"Trailing stop initialisé à {trailing_stop_value} USDT pour {symbol}")
-
-    while True:
-        close_price = exchange.get_price(symbol)
-        if close_price is None:
-            break
-
-        if close_price > ath:
-            ath = close_price
-            trailing_stop_value = ath * 0.99
-            logging.info(f"Nouveau ATH: {ath} USDT, Trailing stop ajusté à {trailing_stop_value} USDT pour {symbol}")
-            
-        if close_price < trailing_stop_value:
-            logging.info(f"Close: {close_price} ATH: {ath} Trailing_stop: {trailing_stop_value} Executed")
-            exchange.place_order(symbol, 'sell', quantity, close_price)
-            clear_open_position()
-            break
-
-        price_change_percent = ((close_price - buy_price) / buy_price) * 100
-        usdt_change = (close_price - buy_price) * quantity
-
-        if price_change_percent >= 0:
-            variation_message = f"Gain de {price_change_percent:.2f}% ({usdt_change:.2f} USDT)"
-        else:
-            variation_message = f"Perte de {price_change_percent:.2f}% ({usdt_change:.2f} USDT)"
+    # Ordres stop natifs: seulement si ccxt les gere sur le marche spot de l'echange
+    # (sur MEXC, ccxt ne les accepte que pour les contrats)
+    def supports_native_stops(self, symbol):
+        market = (self.market or {}).get(symbol) or {}
+        return bool(self._session.has.get('createStopLimitOrder')) and self.exchange_name != "mexc" and market.get('spot', False)
 
-        logging.info(f"Close: {close_price} ATH: {ath} Trailing_stop: {trailing_stop_value} | {variation_message}")
-        telegram_send(f"📈 Close: {close_price} ATH: {ath} Trailing_stop: {trailing_stop_value} | {variation_message}")
-        
-        time.sleep(1)
-
-def is_symbol_supported(symbol, exchange_name):
-    try:
-        symbols = get_symbols(exchange_name)
-        return symbol in symbols
-    except Exception as e:
-        logging.error(f"Erreur lors de la verification du symbole supporte: {e}")
-        return False
-
-def get_symbols(exchange_name):
-    try:
-        exchange = getattr(ccxt, exchange_name)()
-        return exchange.load_markets().keys()
-    except Exception as e:
-        logging.error(f"Erreur lors de la recuperation des symboles pour {exchange_name}: {e}")
-        return []
-
-# Verifier si le fichier traded_pairs.json existe, sinon le creer
-traded_pairs_file = 'traded_pairs.json'
-if not os.path.exists(traded_pairs_file):
-    with open(traded_pairs_file, 'w') as f:
-        json.dump([], f)
-
-# Charger les paires tradees
-def load_traded_pairs(file_path):
-    if os.path.exists(file_path):
-        with open(file_path, 'r') as f:
-            return json.load(f)
-    return []
+    @metrics.timed('exchange_call_seconds')
+    @authentication_required
+    async def place_stop_order(self, symbol, quantity, stop_price, price):
+        if self.dry_run:
+            logging.info(f"[DRY RUN] stop order of {quantity} {symbol} at {stop_price} USDT would be placed.")
+            return None
+        try:
+            return await self._session.create_order(symbol, 'limit', 'sell', quantity, price, {'stopPrice': stop_price})
+        except Exception as e:
+            logging.error(f"Erreur lors du placement de l'ordre stop pour {symbol}: {e}")
+            telegram_send(f"Erreur lors du placement de l'ordre stop pour {symbol}: {e}", priority=TRADE)
+        return None
 
-traded_pairs = load_traded_pairs(traded_pairs_file)
+    @metrics.timed('exchange_call_seconds')
+    @authentication_required
+    async def fetch_order(self, order_id, symbol):
+        try:
+            return await self._session.fetch_order(order_id, symbol)
+        except Exception as e:
+            logging.error(f"Erreur lors de la recuperation de l'ordre {order_id} pour {symbol}: {e}")
+            return None
 
-# Ensemble pour stocker les paires déjà tradées dans cette session
-traded_pairs_session = set(traded_pairs)
+    @metrics.timed('exchange_call_seconds')
+    @authentication_required
+    async def cancel_order(self, order_id, symbol):
+        try:
+            return await self._session.cancel_order(order_id, symbol)
+        except ccxt.OrderNotFound as e:
+            # Deja execute ou deja annule: l'etat final est relu par l'appelant
+            logging.info(f"Ordre {order_id} pour {symbol} introuvable a l'annulation: {e}")
+        except Exception as e:
+            logging.error(f"Erreur lors de l'annulation de l'ordre {order_id} pour {symbol}: {e}")
+        return None
 
-# Choix de l'echange
+# Choix de l'echange principal; les echanges de la cle "exchanges" sont surveilles en parallele
 exchange_name = "mexc"
+# Flux WebSocket public; vide pour n'utiliser que le REST (lu par configure())
+ws_url = MEXC_WS_URL if exchange_name == "mexc" else ''
 def load_symbols(file_path):
     if os.path.exists(file_path) and os.path.getsize(file_path) > 0:
         with open(file_path, 'r') as f:
@@ -264,61 +301,46 @@ def load_symbols(file_path):
 
 symbols_file = 'symbols.json'
 def save_symbols(file_path, symbols):
-    with open(file_path, 'w') as f:
-        json.dump(list(symbols), f)
+    save_json(file_path, list(symbols))
     logging.info(f"Symboles sauvegardés dans {file_path}")
 
-symbols = get_symbols(exchange_name)
-save_symbols(symbols_file, symbols)
-symbols = load_symbols(symbols_file)
-
-if not symbols:
-    symbols = get_symbols(exchange_name)
-    save_symbols(symbols_file, symbols)
-symbols = load_symbols(symbols_file)
+# Derniere liste connue des symboles: reference pour detecter les listings apparus depuis (lue par main())
+symbols = []
 
-if not symbols:
-    symbols = get_symbols(exchange_name)
-    save_symbols(symbols_file, symbols)
+# Surveillance des nouveaux listings de l'echange principal (univers des symboles rafraichi par difference)
+listing_watch = None
 
 dry_run_mode = False
-exchange = SpotExchange(exchange_name, **exchange_auth, dry_run=dry_run_mode)
-logging.info(f"Symboles recuperes : {symbols}")
-
-# Charger la position ouverte si elle existe
-open_position = load_open_position()
-if open_position:
-    logging.info(f"Reprise de la position ouverte: {open_position['symbol']} à {open_position['buy_price']} USDT pour {open_position['quantity']} unités.")
-    trailing_stop(open_position['symbol'], exchange, open_position['buy_price'], open_position['quantity'])
-
-def save_traded_pairs(file_path, traded_pairs):
-    with open(file_path, 'w') as f:
-        json.dump(list(traded_pairs), f)
-    logging.info(f"Paires tradees sauvegardees dans {file_path}")
-
-# Fonction pour écouter les messages Telegram
-def listen_telegram():
-    url = f'https://api.telegram.org/bot{bot_token}/getUpdates'
-    response = requests.get(url)
-    if response.status_code == 200:
-        messages = response.json().get('result', [])
-        if messages:
-            last_message = messages[-1]
-            message_text = last_message['message']['text']
-            return message_text
-    return None
+# L'objet SpotExchange de l'echange principal est cree dans main(), une fois la boucle asyncio demarree
+exchange = None
+
+# Positions ouvertes (une par paire), paires deja tradees et historique des ordres (ouvert par main())
+position_store = None
 
 # Variables globales pour contrôler l'état du bot
 is_paused = False
-previous_state = None  # Variable pour suivre l'état précédent du bot
 
 # Variable pour suivre l'état du clavier
 keyboard_sent = False
 
-# Variables pour suivre l'état des messages
-last_change_pair_error_sent = False
-last_pause_message_sent = False
-last_resume_message_sent = False
+# Commandes Telegram recues par long polling, offset sauvegarde dans telegram_offset.json (cree par main())
+telegram_updates = None
+
+# Flux de marche WebSocket (dernier prix et carnet par symbole)
+market_feed = None
+
+# Suivi des ordres (flux prive des ordres + sondage REST adaptatif)
+order_manager = None
+user_stream = None
+
+# Machines a etats des paires suivies sur l'echange principal
+pair_manager = None
+
+# Echanges surveilles (adaptateurs par echange, index des symboles et routage des achats)
+venue_pool = None
+
+# Enregistrement des transactions, carnets et ordres des paires suivies (record_market_data)
+recorder = None
 
 # Fonction pour envoyer le clavier personnalisé
 def send_telegram_keyboard():
@@ -326,204 +348,239 @@ def send_telegram_keyboard():
     if not keyboard_sent:
         keyboard = {
             "keyboard": [
-                ["/pause", "/resume", "/change_paire"]
+                ["/pause", "/resume", "/paires"],
+                ["/change_paire", "/add_paire", "/remove_paire"]
             ],
             "resize_keyboard": True,
             "one_time_keyboard": True
         }
-        send_text = f'https://api.telegram.org/bot{bot_token}/sendMessage?chat_id={bot_chatID}&text=Commandes disponibles&reply_markup={json.dumps(keyboard)}'
-        requests.get(send_text)
+        notifier.send("Commandes disponibles", reply_markup=keyboard)
         keyboard_sent = True
 
-# Appeler la fonction pour envoyer le clavier personnalisé au démarrage du bot
-send_telegram_keyboard()
+# Commandes de gestion des paires: /change_paire remplace les paires en attente,
+# /add_paire en ajoute une, /remove_paire en retire une
+pair_commands = {
+    "/change_paire": lambda symbol: venue_pool.replace(symbol),
+    "/add_paire": lambda symbol: venue_pool.add(symbol),
+    "/remove_paire": lambda symbol: venue_pool.remove(symbol),
+}
+
+def process_pair_command(command_text):
+    parts = command_text.split()
+    command = parts[0]
+    action = pair_commands[command]
+    # L'heure programmee n'a de sens que pour un ajout de paire
+    if len(parts) == 2 or (len(parts) == 3 and command != "/remove_paire"):
+        _, new_pair_value = parts[0:2]
+        change_time = parts[2] if len(parts) == 3 else None
+
+        if change_time:
+            try:
+                # Vérifier l'heure actuelle du système
+                now = datetime.now()
+                change_time = datetime.strptime(change_time, "%H%M").time()
+                change_datetime = datetime.combine(now, change_time)
+                if change_datetime < now:
+                    change_datetime += timedelta(days=1)
+                delay = (change_datetime - now).total_seconds()
+                asyncio.get_running_loop().call_later(delay, action, new_pair_value)
+                logging.info(f"Paire {new_pair_value} changée programmée pour {change_time}.")
+                telegram_send(f"Paire {new_pair_value} changée programmée pour {change_time}.")
+            except ValueError:
+                logging.error("Format de l'heure incorrect. Utilisez HHMM.")
+                telegram_send("Format de l'heure incorrect. Utilisez HHMM.")
+        else:
+            action(new_pair_value)
+    else:
+        logging.error(f"Commande {command} mal formée. Format attendu: {command} BTC/USDT [HHMM]")
+        telegram_send(f"Commande {command} mal formée. Format attendu: {command} BTC/USDT [HHMM]")
 
-# Fonction pour traiter les commandes Telegram
-def process_telegram_commands():
-    global current_pair, can_send_bid_ask_error, is_paused, previous_state, keyboard_sent
-    global last_change_pair_error_sent, last_pause_message_sent, last_resume_message_sent
+# Fonction pour traiter les commandes Telegram; chaque commande n'arrive qu'une seule fois
+async def process_telegram_commands(new_pair):
+    global is_paused, keyboard_sent
 
-    new_pair = listen_telegram()
     if new_pair:
-        if new_pair.startswith("/change_paire"):
-            parts = new_pair.split()
-            if len(parts) == 2 or len(parts) == 3:
-                _, new_pair_value = parts[0:2]
-                change_time = parts[2] if len(parts) == 3 else None
-
-                if change_time:
-                    try:
-                        # Vérifier l'heure actuelle du système
-                        now = datetime.now()
-                        change_time = datetime.strptime(change_time, "%H%M").time()
-                        change_datetime = datetime.combine(now, change_time)
-                        if change_datetime < now:
-                            change_datetime += timedelta(days=1)
-                        delay = (change_datetime - now).total_seconds()
-                        threading.Timer(delay, change_pair, args=(new_pair_value,)).start()
-                        logging.info(f"Paire {new_pair_value} changée programmée pour {change_time}.")
-                        telegram_send(f"Paire {new_pair_value} changée programmée pour {change_time}.")
-                    except ValueError:
-                        logging.error("Format de l'heure incorrect. Utilisez HHMM.")
-                        telegram_send("Format de l'heure incorrect. Utilisez HHMM.")
-                else:
-                    change_pair(new_pair_value)
-            else:
-                logging.error("Commande /change_paire mal formée. Format attendu: /change_paire BTC/USDT [HHMM]")
-                if not last_change_pair_error_sent:
-                    telegram_send("Commande /change_paire mal formée. Format attendu: /change_paire BTC/USDT [HHMM]")
-                    last_change_pair_error_sent = True
+        if new_pair.split()[0] in pair_commands:
+            process_pair_command(new_pair)
+        elif new_pair == "/paires":
+            telegram_send(venue_pool.status())
         elif new_pair == "/pause":
             if not is_paused:  # Vérifier si le bot n'est pas déjà en pause
-                is_paused = True
+                is_paused = venue_pool.paused = True
                 logging.info("Bot mis en pause via Telegram.")
-                if not last_pause_message_sent:  # Vérifier si le message a déjà été envoyé
-                    telegram_send("Bot mis en pause.")
-                    last_pause_message_sent = True  # Marquer le message comme envoyé
+                telegram_send("Bot mis en pause.")
         elif new_pair == "/resume":
             if is_paused:  # Vérifier si le bot est en pause
-                is_paused = False
+                is_paused = venue_pool.paused = False
                 logging.info("Bot relancé via Telegram.")
-                if not last_resume_message_sent:  # Vérifier si le message a déjà été envoyé
-                    telegram_send("Bot relancé.")
-                    last_resume_message_sent = True  # Marquer le message comme envoyé
+                telegram_send("Bot relancé.")
                 keyboard_sent = False  # Réinitialiser l'état du clavier
         # Envoyer le clavier personnalisé après avoir traité une commande
         send_telegram_keyboard()
 
-def change_pair(new_pair_value):
-    global current_pair, last_change_pair_error_sent
-    if not open_position:
-        if new_pair_value in traded_pairs_session:
-            logging.info(f"La paire {new_pair_value} a déjà été tradée. Ignorer cette paire.")
-            return
-        current_pair = new_pair_value
-        logging.info(f"Paire changée à {current_pair} via Telegram.")
-        telegram_send(f"Paire changée à {current_pair} via Telegram.")
-        last_change_pair_error_sent = False
-        if current_pair not in traded_pairs:
-            logging.warning(f"La paire {current_pair} n'est pas dans traded_pairs.")
-            telegram_send(f"Alerte : La paire {current_pair} n'est pas dans la liste des paires tradées.")
-    else:
-        logging.info("Impossible de changer la paire, un trade est en cours.")
-        if not last_change_pair_error_sent:
-            telegram_send("Impossible de changer la paire, un trade est en cours.")
-            last_change_pair_error_sent = True
+# Traitement d'une commande Telegram, chronometre
+async def handle_telegram_command(message_text):
+    with metrics.timer('loop_phase_seconds', phase='telegram_command'):
+        await process_telegram_commands(message_text)
 
-# Ajouter une variable pour contrôler l'envoi des messages d'erreur
-can_send_bid_ask_error = True
+# Lecture des commandes Telegram dans sa propre tache, sans jamais bloquer les paires suivies
+async def telegram_poller():
+    send_telegram_keyboard()
+    await telegram_updates.run(handle_telegram_command)
 
-def get_current_price(pair, exchange_name):
+# Rafraichissement du solde USDT d'un echange, periodiquement ou apres chaque ordre
+async def balance_refresher(venue):
+    manager = venue.manager
+    while True:
+        with metrics.timer('loop_phase_seconds', phase='balance_refresh'):
+            manager.update_balance(await venue.exchange.get_balance())
+        manager.balance_stale.clear()
+        try:
+            await asyncio.wait_for(manager.balance_stale.wait(), balance_refresh_interval)
+        except asyncio.TimeoutError:
+            pass
+
+# Univers de reference des listings, charge en tache de fond pour ne pas retarder le demarrage;
+# seul celui de l'echange principal est sauvegarde dans symbols.json
+async def listing_watcher(venue):
+    global symbols
     try:
-        exchange = getattr(ccxt, exchange_name)()
-        ticker = exchange.fetch_ticker(pair)
-        return ticker['last']
+        await venue.listings.refresh()
+        if venue.name == exchange_name:
+            symbols = sorted(venue.listings.ids)
+            save_symbols(symbols_file, symbols)
+        logging.info(f"Symboles recuperes sur {venue.name} : {len(venue.listings.ids)}")
     except Exception as e:
-        logging.error(f"Erreur lors de la récupération du prix actuel pour {pair}: {e}")
-        return None
+        logging.error(f"Erreur lors de la recuperation des symboles pour {venue.name}: {e}")
+    await venue.listings.run()
 
-# Boucle principale optimisée
-while True:
+# Les marches viennent du cache au demarrage; ils sont retelecharges a l'expiration du cache, au
+# plus une fois par market_refresh_interval (un ttl de 0 ne fait pas tourner la boucle a vide)
+async def market_refresher(venue):
+    while True:
+        await asyncio.sleep(max(registry.cache.expires_in(venue.name), venue.manager.market_refresh_interval))
+        try:
+            await venue.exchange.reload_markets()
+            venue_pool.refresh_index(venue.name)
+        except Exception as e:
+            logging.error(f"Erreur lors du rafraichissement des marches pour {venue.name}: {e}")
+            await asyncio.sleep(min(market_cache_ttl, 60))
+
+# Nouveau symbole sur un echange: prevenir, sauvegarder l'univers et reveiller ou armer la paire
+def on_new_listing(venue, symbol):
+    telegram_send(f"🆕 Nouveau listing détecté sur {venue.name}: {symbol}")
+    if venue.name == exchange_name:
+        save_symbols(symbols_file, sorted(venue.listings.ids))
+    if not venue.listings.url:
+        # Listing detecte dans les marches telecharges: l'echange et l'index les reprennent tels quels
+        venue.exchange.market = registry.markets(venue.name)
+        venue_pool.refresh_index(venue.name)
+    venue_pool.on_listing(venue.name, symbol)
+
+# Jauges lues a chaque requete /metrics: poids des requetes, requetes envoyees et etat des paires
+def metric_gauges():
+    gauges = [('http_requests_total', {}, registry.counter.total)]
+    for name, values in registry.scheduler.metrics().items():
+        for key, value in values.items():
+            gauges.append((f'rate_limit_{key}', {'exchange': name}, value))
+    if venue_pool is not None:
+        for venue in venue_pool.venues.values():
+            for snipe in venue.manager.snipes.values():
+                gauges.append(('pair_state', {'exchange': venue.name, 'symbol': snipe.symbol, 'state': snipe.state.value}, 1))
+    return gauges
+
+# Adaptateurs d'un echange: flux WebSocket public et flux prive des ordres sur MEXC; ailleurs,
+# prix et carnets par le repli REST (un fetch_tickers groupe par tick) et ordres suivis par sondage
+async def build_venue(venue_config):
+    name = venue_config['name']
+    apiKey, secret = venue_config.get('apiKey'), venue_config.get('secret')
+    feed_url = venue_config.get('ws_url', MEXC_WS_URL if name == "mexc" else '')
+    venue_exchange = SpotExchange(name, apiKey=apiKey, secret=secret, dry_run=dry_run_mode)
+    await venue_exchange.load()
+    symbols_url = MEXC_SYMBOLS_URL if name == "mexc" else None
+    listings = ListingWatch(name, url=symbols_url, interval=listing_watch_interval if symbols_url else listing_watch_markets_interval,
+                            known=symbols if name == exchange_name else (), auto_arm_patterns=auto_arm_patterns)
+    pricing = PricingService(venue_exchange)
+    # Les archives de marche ne melangent pas les echanges: seul l'echange principal est enregistre
+    venue_recorder = recorder if name == exchange_name else None
+    feed = MarketDataFeed(venue_exchange, url=feed_url, rest_interval=listing_poll_interval, pricing=pricing, recorder=venue_recorder)
+    stream = None
+    if feed_url and name == "mexc" and venue_exchange._auth and not dry_run_mode:
+        stream = UserDataStream(apiKey, secret, url=feed_url)
+    orders = OrderManager(venue_exchange, stream, recorder=venue_recorder)
+    if stream is not None:
+        stream.on_order_update = orders.on_order_update
+    manager = PairManager(venue_exchange, feed, orders, position_store, telegram_send, config,
+                          pricing=pricing, listings=listings, venue=name)
+    return Venue(name, venue_exchange, feed, orders, manager, listings=listings, pricing=pricing, user_stream=stream)
+
+# Moteur principal: Telegram, et pour chaque echange le solde, les flux, les listings et chaque paire
+# suivie, tournent en taches paralleles
+async def main():
+    global exchange, symbols, position_store, listing_watch, market_feed, order_manager, user_stream, pair_manager, recorder
+    global venue_pool, notifier, telegram_updates
+
+    started_at = time.perf_counter()
+    if config is None:
+        configure()
+    # Objets lies a la boucle asyncio: crees ici, pas dans configure() qui ne fait que lire la config
+    notifier = TelegramNotifier(bot_token, bot_chatID, status_interval=telegram_status_interval)
+    telegram_updates = TelegramUpdates(bot_token, bot_chatID, timeout=telegram_long_poll_timeout, retry_interval=telegram_poll_interval)
+    notifier_task = asyncio.create_task(notifier.run())
+    position_store = PositionStore(journal_file, open_position_file, traded_pairs_file)
+    symbols = load_symbols(symbols_file)
+    registry.cache = MarketCache(markets_cache_file, ttl=market_cache_ttl)
     try:
-        # Traiter les commandes Telegram
-        process_telegram_commands()
-
-        # Vérifier si le bot est en pause
-        if is_paused:
-            if previous_state != "paused":
-                logging.info("Bot en pause. En attente de la commande /resume...")
-                previous_state = "paused"
-            time.sleep(10)
-            continue
-        else:
-            if previous_state == "paused":
-                previous_state = "running"
-
-        # Attendre qu'une paire soit définie si aucune paire n'est enregistrée
-        if not current_pair:
-            logging.info("Aucune paire définie. En attente d'une paire via Telegram...")
-            telegram_send("Aucune paire définie. Veuillez envoyer une paire via la commande /change_paire.")
-            time.sleep(10)
-            continue
-
-        if current_pair in symbols:
-            if current_pair in traded_pairs_session:
-                logging.info(f"{str(datetime.now()).split('.')[0]} | {current_pair} a déjà été tradée. Ignorer cette paire.")
-                # Effacer la paire actuelle et attendre une nouvelle commande
-                current_pair = ''
-                logging.info("Paire actuelle effacée. En attente d'une nouvelle paire via Telegram...")
-                telegram_send("Paire actuelle effacée. Veuillez envoyer une nouvelle paire via la commande /change_paire.")
-                time.sleep(10)  # Réduire le temps d'attente à 10 secondes
-                continue
-
-            logging.info(f"{str(datetime.now()).split('.')[0]} | Tentative de sniping sur {current_pair}")
-            current_price = get_current_price(current_pair, exchange_name)  # Utiliser le prix actuel
-            if current_price is None or current_price == 0:
-                logging.info(f"{str(datetime.now()).split('.')[0]} | {current_pair} n'est pas disponible ou le prix est zéro. Attente que la paire soit listée.")
-                telegram_send(f"{str(datetime.now()).split('.')[0]} | {current_pair} n'est pas disponible ou le prix est zéro. Attente que la paire soit listée.")
-                time.sleep(10)
-                continue
-
-            usdt_balance = exchange.get_balance()
-            
-            if usdt_amount > usdt_balance:
-                logging.warning(f"Le montant d'achat ({usdt_amount} USDT) est superieur au solde disponible ({usdt_balance} USDT). Ajustement du montant d'achat.")
-                usdt_amount = usdt_balance * 0.95
-
-            quantity = usdt_amount / current_price  # Utiliser le prix actuel
-            quantity = float(exchange.convert_amount_to_precision(current_pair, quantity))
-
-            fee_percentage = 0.001
-            adjusted_quantity = quantity * (1 - fee_percentage)
-            adjusted_cost = adjusted_quantity * current_price  # Utiliser le prix actuel
-
-            if adjusted_cost > usdt_balance:
-                logging.error(f"Solde insuffisant pour acheter {adjusted_quantity} {current_pair} au prix actuel de {current_price}. Coût ajuste : {adjusted_cost} USDT. Solde disponible : {usdt_balance} USDT.")
-                telegram_send(f"Solde insuffisant pour acheter {adjusted_quantity} {current_pair} au prix actuel de {current_price}. Coût ajuste : {adjusted_cost} USDT. Solde disponible : {usdt_balance} USDT.")
+        metrics.add_gauge(metric_gauges)
+        await metrics.start(metrics_port)
+        if record_market_data:
+            recorder = MarketRecorder(record_directory, chunk_seconds=record_chunk_seconds)
+        venue_pool = VenuePool(telegram_send, route_window=venue_route_window)
+        # Les marches de tous les echanges sont charges en parallele; un echange secondaire
+        # indisponible est ignore, l'echange principal est indispensable
+        venue_configs = [dict(exchange_auth, name=exchange_name, ws_url=ws_url)] + list(exchanges)
+        venues = await asyncio.gather(*(build_venue(venue_config) for venue_config in venue_configs), return_exceptions=True)
+        for venue_config, venue in zip(venue_configs, venues):
+            if isinstance(venue, Exception):
+                if venue_config['name'] == exchange_name:
+                    raise venue
+                logging.error(f"Echange {venue_config['name']} ignore: {venue}")
+                telegram_send(f"Echange {venue_config['name']} ignoré: {venue}")
                 continue
-
-            exchange.reload_markets()
-
-            try:
-                if is_symbol_supported(current_pair, exchange_name):
-                    order_response = exchange.place_order(current_pair, "buy", adjusted_quantity, current_price)  # Utiliser le prix actuel
-                    purchase_price = current_price  # Utiliser le prix actuel
-                    logging.info(f"{str(datetime.now()).split('.')[0]} | Buy {current_pair} Order success at price: {purchase_price} USDT!")
-                    telegram_send(f"{str(datetime.now()).split('.')[0]} |✅ Buy {current_pair} Order success at price: {purchase_price} USDT!")
-
-                    save_open_position(current_pair, purchase_price, adjusted_quantity)
-
-                    logging.info(f"{str(datetime.now()).split('.')[0]} | Waiting for sell...")
-                    telegram_send(f"⌛ Waiting for sell...")
-
-                    trailing_stop(current_pair, exchange, purchase_price, adjusted_quantity)
-
-                    sell_price = exchange.get_price(current_pair)  # Utiliser le prix actuel pour la vente
-                    profit_percentage = ((sell_price - purchase_price) / purchase_price) * 100 if purchase_price else 0
-                    profit_usdt = (sell_price - purchase_price) * adjusted_quantity
-
-                    exchange.place_order(current_pair, "sell", adjusted_quantity, sell_price)
-                    logging.info(f"{str(datetime.now()).split('.')[0]} | Sell {current_pair} Order success at price: {sell_price} USDT! Profit: {profit_percentage:.2f}% ({profit_usdt:.2f} USDT)")
-                    telegram_send(f"{str(datetime.now()).split('.')[0]} |✅ 💯 Sell {current_pair} Order success at price: {sell_price} USDT! Profit: {profit_percentage:.2f}% ({profit_usdt:.2f} USDT)")
-
-                    clear_open_position()
-
-                    traded_pairs_session.add(current_pair)
-                    traded_pairs.append(current_pair)
-                    save_traded_pairs(traded_pairs_file, traded_pairs)
-                else:
-                    logging.error(f"Le symbole {current_pair} n'est pas supporte par l'API de l'echange {exchange_name}.")
-                    telegram_send(f"Le symbole {current_pair} n'est pas supporte par l'API de l'echange {exchange_name}.")
-            except ccxt.ExchangeError as e:
-                logging.error(f"Erreur d'echange lors du placement de l'ordre marche pour {current_pair}: {e}")
-                telegram_send(f"Erreur d'echange lors du placement de l'ordre marche pour {current_pair}: {e}")
-            except Exception as e:
-                logging.error(f"Erreur inattendue lors de la transaction pour {current_pair}: {e}")
-                telegram_send(f"Erreur inattendue lors de la transaction pour {current_pair}: {e}")
-        else:
-            logging.info(f"{str(datetime.now()).split('.')[0]} | {current_pair} n'est pas dans la liste des symboles ou a déjà été tradée.")
-            logging.info(f"{str(datetime.now()).split('.')[0]} | Attente de 10 secondes pour que la paire soit listée.")
-            time.sleep(10)
-    except Exception as e:
-        logging.error(f"Erreur dans la boucle principale: {e}")
-        time.sleep(5)
+            venue_pool.add_venue(venue)
+            venue.listings.add_listener(partial(on_new_listing, venue))
+        primary = venue_pool.primary
+        exchange, listing_watch, market_feed = primary.exchange, primary.listings, primary.feed
+        order_manager, user_stream, pair_manager = primary.orders, primary.user_stream, primary.manager
+        logging.info(f"Echanges surveilles: {', '.join(venue_pool.venues)} ({len(venue_pool.index)} symboles indexes)")
+        logging.info(f"Requetes HTTP au demarrage: {registry.counter.total} ({registry.counter.summary()})")
+        logging.info(f"Poids des requetes au demarrage: {registry.scheduler.summary()}")
+        venue_pool.restore()
+        if not venue_pool.snipes:
+            logging.info("Aucune paire définie. En attente d'une paire via Telegram...")
+            telegram_send("Aucune paire définie. Veuillez envoyer une paire via la commande /change_paire ou /add_paire.")
+        startup = time.perf_counter() - started_at
+        metrics.observe('startup_seconds', startup)
+        logging.info(f"Bot pret en {startup * 1000:.0f} ms.")
+        await asyncio.gather(
+            telegram_poller(),
+            *(task for venue in venue_pool.venues.values()
+              for task in (balance_refresher(venue), market_refresher(venue), listing_watcher(venue), *venue.tasks())),
+            *([recorder.run()] if recorder is not None else []),
+        )
+    finally:
+        if recorder is not None:
+            await recorder.close()
+        position_store.close()
+        await notifier.close(notifier_task)
+        await metrics.stop()
+        await registry.close()
+
+if __name__ == '__main__':
+    configure()
+    # Les appels de log ne font qu'empiler un record; un thread formate et ecrit
+    log_listener = setup_logging(log_level, json_output=log_json, log_file=log_file, sample_interval=log_sample_interval)
+    try:
+        asyncio.run(main())
+    finally:
+        log_listener.stop()
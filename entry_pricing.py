@@ -0,0 +1,75 @@
+import numpy as np
+
+# Prix d'entree a partir de la profondeur du carnet: le carnet est parcouru (de facon vectorisee)
+# jusqu'a couvrir le budget, sans depasser le prix plafond max_slippage au-dessus du meilleur ask.
+# Modes: 'limit' (ordre au prix du dernier niveau necessaire), 'aggressive' (ordre au plafond,
+# pour remplir meme si le carnet bouge) et 'ioc' (au plafond, le reste est annule aussitot).
+
+MODES = ('limit', 'aggressive', 'ioc')
+
+
+# Parcours du carnet par sommes cumulees: niveau ou le budget (en quote) ou la quantite est atteint.
+# Renvoie None si aucun niveau n'est sous le plafond.
+def walk_book(levels, budget=None, quantity=None, price_cap=None):
+    levels = np.asarray(levels, dtype=float).reshape(-1, 2)
+    if price_cap is not None:
+        levels = levels[levels[:, 0] <= price_cap]
+    if not len(levels):
+        return None
+    prices, volumes = levels[:, 0], levels[:, 1]
+    notionals = prices * volumes
+    cumulative = np.cumsum(notionals if budget is not None else volumes)
+    target = budget if budget is not None else quantity
+    index = int(np.searchsorted(cumulative, target))
+    if index >= len(levels):
+        # Profondeur insuffisante: tout ce qui est sous le plafond
+        cost = float(notionals.sum())
+        filled = float(volumes.sum())
+        return {'price': float(prices[-1]), 'quantity': filled, 'cost': cost, 'average': cost / filled if filled else None, 'complete': False}
+    cost_before = float(notionals[:index].sum())
+    quantity_before = float(volumes[:index].sum())
+    price = float(prices[index])
+    if budget is not None:
+        filled = quantity_before + (budget - cost_before) / price
+        cost = budget
+    else:
+        filled = quantity
+        cost = cost_before + (quantity - quantity_before) * price
+    return {'price': price, 'quantity': filled, 'cost': cost, 'average': cost / filled if filled else None, 'complete': True}
+
+
+class EntryPricer():
+    def __init__(self, max_slippage=0.05, mode='limit'):
+        if mode not in MODES:
+            raise ValueError(f"Mode d'entree inconnu: {mode} (attendu: {', '.join(MODES)}).")
+        self.max_slippage = max_slippage
+        self.mode = mode
+
+    # Parametres ccxt de l'ordre selon le mode
+    def order_params(self):
+        return {'timeInForce': 'IOC'} if self.mode == 'ioc' else {}
+
+    # Plafond au-dessus du meilleur ask; sans carnet (listing tout frais), au-dessus du dernier prix
+    def price_cap(self, book, last_price=None):
+        asks = (book or {}).get('asks') or []
+        reference = asks[0][0] if asks else last_price
+        return reference * (1 + self.max_slippage) if reference else None
+
+    # Devis d'achat pour un budget (en quote) ou une quantite; None si le carnet est vide
+    # ou entierement au-dessus du plafond
+    def quote(self, book, budget=None, quantity=None, price_cap=None):
+        asks = (book or {}).get('asks') or []
+        if not asks:
+            return None
+        if price_cap is None:
+            price_cap = self.price_cap(book)
+        walk = walk_book(asks, budget=budget, quantity=quantity, price_cap=price_cap)
+        if walk is None:
+            return None
+        price = walk['price'] if self.mode == 'limit' else price_cap
+        walk.update({
+            'price': price,
+            'price_cap': price_cap,
+            'slippage': walk['average'] / asks[0][0] - 1 if walk['average'] else 0.0,
+        })
+        return walk
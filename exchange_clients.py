@@ -0,0 +1,162 @@
+import asyncio
+import logging
+import ssl
+from collections import Counter
+from urllib.parse import urlsplit
+
+import aiohttp
+import certifi
+import ccxt.async_support
+
+from rate_limiter import RequestScheduler, request_priority
+
+# Registre des clients ccxt partage par tout le processus: un seul client par echange,
+# une seule session HTTP (keep-alive) et des marches charges une seule fois, depuis le cache
+# persistant s'il y en a un. Toutes les requetes REST passent par l'ordonnanceur a priorites
+# (poids des endpoints publies par ccxt).
+
+
+# Compteur des requetes HTTP reellement envoyees aux echanges
+class RequestCounter():
+    def __init__(self):
+        self.total = 0
+        self.by_endpoint = Counter()
+
+    def record(self, exchange_name, method, url):
+        self.total += 1
+        self.by_endpoint[f"{exchange_name} {method} {urlsplit(url).path}"] += 1
+
+    # Nombre de requetes envoyees depuis une valeur precedente de total
+    def since(self, mark):
+        return self.total - mark
+
+    def summary(self, limit=10):
+        return ", ".join(f"{endpoint}: {count}" for endpoint, count in self.by_endpoint.most_common(limit))
+
+
+class ClientRegistry():
+    def __init__(self, pool_size=20, keepalive_timeout=60):
+        self.pool_size = pool_size
+        self.keepalive_timeout = keepalive_timeout
+        self.counter = RequestCounter()
+        self.scheduler = RequestScheduler()
+        # MarketCache optionnel: marches relus depuis le disque au demarrage, sauvegardes a chaque telechargement
+        self.cache = None
+        self._clients = {}
+        self._markets = {}
+        self._locks = {}
+        self._session = None
+
+    # La session est creee a la demande, dans la boucle asyncio en cours
+    def _get_session(self):
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.pool_size,
+                keepalive_timeout=self.keepalive_timeout,
+                ttl_dns_cache=300,
+                ssl=ssl.create_default_context(cafile=certifi.where()),
+            )
+            self._session = aiohttp.ClientSession(connector=connector, trust_env=True)
+        return self._session
+
+    # Session HTTP partagee, aussi utilisee pour les connexions WebSocket
+    def session(self):
+        return self._get_session()
+
+    def _instrument(self, client):
+        fetch = client.fetch
+
+        async def counted_fetch(url, method='GET', headers=None, body=None):
+            self.counter.record(client.id, method, url)
+            return await fetch(url, method, headers, body)
+
+        client.fetch = counted_fetch
+
+        # Le limiteur interne de ccxt (file unique) est remplace par l'ordonnanceur a priorites
+        fetch2 = client.fetch2
+        retry_on = (ccxt.async_support.DDoSProtection,)
+
+        async def scheduled_fetch2(path, api='public', method='GET', params={}, headers=None, body=None, config={}, context={}):
+            weight = client.calculate_rate_limiter_cost(api, method, path, params, config, context)
+            return await self.scheduler.run(
+                client.id, weight, request_priority(method, path),
+                lambda: fetch2(path, api, method, params, headers, body, config, context),
+                endpoint=f"{method} {path}", retry_on=retry_on)
+
+        client.fetch2 = scheduled_fetch2
+        client.enableRateLimit = False
+        requests_per_second = 1000 / client.rateLimit
+        self.scheduler.configure(client.id, requests_per_second, requests_per_second)
+
+    # Requete hors ccxt (listenKey, liste des symboles): comptee puis executee a son tour
+    async def throttle(self, exchange_name, method, url, weight=1):
+        self.counter.record(exchange_name, method, url)
+        await self.scheduler.acquire(exchange_name, weight, request_priority(method, urlsplit(url).path), f"{method} {urlsplit(url).path}")
+
+    # Retourne le client de l'echange; les identifiants fournis plus tard sont ajoutes au client existant
+    def get(self, exchange_name, apiKey=None, secret=None):
+        client = self._clients.get(exchange_name)
+        if client is None:
+            params = {'session': self._get_session()}
+            if secret is not None:
+                params.update({'apiKey': apiKey, 'secret': secret})
+            client = getattr(ccxt.async_support, exchange_name)(params)
+            self._instrument(client)
+            self._clients[exchange_name] = client
+        elif secret is not None and not client.secret:
+            client.apiKey = apiKey
+            client.secret = secret
+        return client
+
+    # Marches en cache, meme perimes: le rafraichissement est laisse a l'appelant
+    def _load_cached(self, exchange_name):
+        entry = self.cache.load(exchange_name)
+        if not entry or not entry.get('markets'):
+            return False
+        client = self.get(exchange_name)
+        self._markets[exchange_name] = client.set_markets(list(entry['markets'].values()), entry.get('currencies'))
+        logging.info(f"{len(self._markets[exchange_name])} marches {exchange_name} charges depuis le cache "
+                     f"({self.cache.age(exchange_name):.0f}s).")
+        return True
+
+    # Un seul telechargement des marches a la fois par echange, partage par tous les appelants
+    async def load_markets(self, exchange_name, reload=False):
+        lock = self._locks.setdefault(exchange_name, asyncio.Lock())
+        async with lock:
+            if not reload and exchange_name not in self._markets and self.cache is not None:
+                self._load_cached(exchange_name)
+            if reload or exchange_name not in self._markets:
+                client = self.get(exchange_name)
+                self._markets[exchange_name] = await client.load_markets(reload)
+                if self.cache is not None:
+                    # Quelques Mo de JSON: ecrits hors de la boucle asyncio
+                    await asyncio.get_running_loop().run_in_executor(
+                        None, self.cache.save, exchange_name, client.markets, client.currencies)
+        return self._markets[exchange_name]
+
+    # Liste des marches retelechargee pour la surveillance des listings: un seul appel fetch_markets,
+    # sans les devises ni l'ecriture du cache (renouvele a son expiration par load_markets)
+    async def refresh_markets(self, exchange_name):
+        lock = self._locks.setdefault(exchange_name, asyncio.Lock())
+        async with lock:
+            client = self.get(exchange_name)
+            markets = await client.fetch_markets()
+            self._markets[exchange_name] = client.set_markets(markets, client.currencies or None)
+        return self._markets[exchange_name]
+
+    def markets(self, exchange_name):
+        return self._markets.get(exchange_name)
+
+    async def close(self):
+        for client in self._clients.values():
+            await client.close()
+        self._clients.clear()
+        self._markets.clear()
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        logging.info(f"Requetes HTTP envoyees: {self.counter.total} ({self.counter.summary()})")
+        logging.info(f"Poids des requetes: {self.scheduler.summary()}")
+
+
+registry = ClientRegistry()
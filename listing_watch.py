@@ -0,0 +1,108 @@
+import asyncio
+import logging
+import re
+
+from exchange_clients import registry
+from market_stream import MEXC_REST_URL
+from metrics import metrics
+
+# Surveillance des nouveaux listings: l'univers des symboles est garde sous forme d'ensemble
+# d'identifiants normalises (BTC/USDT, BTC_USDT -> BTCUSDT). Chaque rafraichissement utilise la
+# liste legere /api/v3/defaultSymbols avec des requetes conditionnelles (ETag, Last-Modified),
+# et seule la difference avec l'ensemble connu declenche des evenements. Sans cette liste (url=None),
+# la liste des marches de l'echange est retelechargee, sans reecrire le cache des marches.
+
+MEXC_SYMBOLS_URL = MEXC_REST_URL + '/api/v3/defaultSymbols'
+
+QUOTES = ('USDT', 'USDC', 'BTC', 'ETH')
+
+
+def normalize_symbol(symbol):
+    return symbol.replace('/', '').replace('_', '').replace('-', '').upper()
+
+
+# Symbole unifie ccxt a partir de l'identifiant de l'echange (NEWUSDT -> NEW/USDT)
+def unified_symbol(market_id, quotes=QUOTES):
+    for quote in quotes:
+        if market_id.endswith(quote) and len(market_id) > len(quote):
+            return f"{market_id[:-len(quote)]}/{quote}"
+    return market_id
+
+
+class ListingWatch():
+    def __init__(self, exchange_name, url=MEXC_SYMBOLS_URL, interval=5, known=(), auto_arm_patterns=()):
+        self.exchange_name = exchange_name
+        self.url = url
+        self.interval = interval
+        self.ids = set(normalize_symbol(symbol) for symbol in known)
+        self.patterns = [re.compile(pattern) for pattern in auto_arm_patterns]
+        self.refreshes = 0
+        self._etag = None
+        self._last_modified = None
+        self._baseline = False
+        self._listeners = []
+
+    # callback(symbol) est appele pour chaque nouveau symbole, sous sa forme unifiee
+    def add_listener(self, callback):
+        self._listeners.append(callback)
+
+    def is_listed(self, symbol):
+        return normalize_symbol(symbol) in self.ids
+
+    def matches_auto_arm(self, symbol):
+        return any(pattern.search(symbol) for pattern in self.patterns)
+
+    # Identifiants actuellement listes, ou None si rien n'a change depuis la derniere requete
+    async def _fetch_ids(self):
+        if not self.url:
+            markets = await registry.refresh_markets(self.exchange_name)
+            return set(normalize_symbol(market['id']) for market in markets.values())
+        headers = {}
+        if self._etag:
+            headers['If-None-Match'] = self._etag
+        if self._last_modified:
+            headers['If-Modified-Since'] = self._last_modified
+        await registry.throttle(self.exchange_name, 'GET', self.url)
+        async with registry.session().get(self.url, headers=headers) as response:
+            if response.status == 304:
+                return None
+            if response.status == 429:
+                delay = registry.scheduler.backoff(self.exchange_name)
+                logging.warning(f"Limite de requetes atteinte sur la liste des symboles, pause de {delay:.2f}s.")
+                return None
+            response.raise_for_status()
+            self._etag = response.headers.get('ETag')
+            self._last_modified = response.headers.get('Last-Modified')
+            data = await response.json(content_type=None)
+        return set(normalize_symbol(market_id) for market_id in data.get('data') or [])
+
+    # Le premier rafraichissement sert de reference; les suivants emettent les symboles apparus
+    async def refresh(self):
+        with metrics.timer('loop_phase_seconds', phase='listing_refresh'):
+            ids = await self._fetch_ids()
+        self.refreshes += 1
+        if not ids:
+            return []
+        new_ids = ids - self.ids
+        removed = len(self.ids - ids)
+        self.ids = ids
+        if not self._baseline:
+            self._baseline = True
+            logging.info(f"Univers de {len(ids)} symboles charge ({len(new_ids)} ajouts, {removed} retraits depuis la derniere sauvegarde).")
+            return []
+        new_symbols = [unified_symbol(market_id) for market_id in sorted(new_ids)]
+        for symbol in new_symbols:
+            logging.info(f"Nouveau listing detecte: {symbol}")
+            for callback in self._listeners:
+                callback(symbol)
+        return new_symbols
+
+    async def run(self):
+        while True:
+            try:
+                await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"Erreur lors du rafraichissement des symboles pour {self.exchange_name}: {e}")
+            await asyncio.sleep(self.interval)
@@ -0,0 +1,97 @@
+import json
+import logging
+import logging.handlers
+import queue
+import time
+
+# Journalisation a faible cout sur le chemin critique: un appel de log ne fait que creer le record
+# et l'ajouter a une file; le formatage (texte ou JSON) et l'ecriture sont faits par le thread du
+# QueueListener. Les messages utilisent le formatage paresseux de logging ("... %s", valeur): la
+# chaine n'est construite que si le record est ecrit.
+# Les lignes frequentes (statuts, attente du listing, nouveaux ATH) portent une cle d'echantillonnage:
+# au plus une ligne par cle toutes les sample_interval secondes, avec le nombre de lignes omises.
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Attributs propres a LogRecord; les autres viennent de extra= et sont les champs structures
+STANDARD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'sample'}
+
+
+# extra=event('status', sample=symbol, symbol=symbol, price=price): champs structures du record.
+# sample: cle d'echantillonnage (combinee au nom de l'evenement), None pour ecrire chaque ligne.
+def event(name, sample=None, **fields):
+    fields['event'] = name
+    if sample is not None:
+        fields['sample'] = (name, sample)
+    return fields
+
+
+# Au plus un record par cle d'echantillonnage et par intervalle; le suivant indique les omissions
+class SamplingFilter(logging.Filter):
+    def __init__(self, interval=10):
+        super().__init__()
+        self.interval = interval
+        self._seen = {}
+
+    def filter(self, record):
+        key = getattr(record, 'sample', None)
+        if key is None or self.interval <= 0:
+            return True
+        now = time.monotonic()
+        last, suppressed = self._seen.get(key, (None, 0))
+        if last is not None and now - last < self.interval:
+            self._seen[key] = (last, suppressed + 1)
+            return False
+        self._seen[key] = (now, 0)
+        if suppressed:
+            record.suppressed = suppressed
+        return True
+
+
+# File en memoire du meme processus: le record est transmis tel quel, sans formatage dans la boucle
+class LazyQueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record):
+        return record
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record):
+        line = super().format(record)
+        suppressed = getattr(record, 'suppressed', 0)
+        return f"{line} (+{suppressed} similaires omises)" if suppressed else line
+
+
+# Une ligne JSON par record: horodatage, niveau, message, puis les champs passes par extra=
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        data = {'ts': record.created, 'level': record.levelname, 'logger': record.name, 'message': record.getMessage()}
+        for key, value in vars(record).items():
+            if key not in STANDARD_ATTRS:
+                data[key] = value
+        if record.exc_info:
+            data['exc'] = self.formatException(record.exc_info)
+        return json.dumps(data, default=str, ensure_ascii=False)
+
+
+# Remplace les handlers du logger racine par la file; renvoie le QueueListener, a arreter (stop())
+# a la sortie pour ecrire les derniers records
+def setup_logging(level='INFO', json_output=False, log_file=None, sample_interval=10):
+    handlers = [logging.StreamHandler()]
+    if log_file:
+        handlers.append(logging.FileHandler(log_file, encoding='utf-8'))
+    formatter = JsonFormatter() if json_output else TextFormatter(TEXT_FORMAT)
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = LazyQueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(sample_interval))
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    return listener
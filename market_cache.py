@@ -0,0 +1,49 @@
+import json
+import logging
+import os
+import time
+
+from atomic_file import save_json
+
+# Cache persistant des metadonnees de marches (precision, limites, statut) par echange: au
+# redemarrage, les marches sont relus depuis le disque au lieu d'etre telecharges, et ne sont
+# rafraichis en tache de fond qu'une fois leur duree de vie (ttl secondes) ecoulee.
+
+
+class MarketCache():
+    def __init__(self, cache_file='markets_cache.json', ttl=3600):
+        self.cache_file = cache_file
+        self.ttl = ttl
+        self._entries = None
+
+    def _read(self):
+        if self._entries is None:
+            self._entries = {}
+            if os.path.exists(self.cache_file) and os.path.getsize(self.cache_file) > 0:
+                try:
+                    with open(self.cache_file, 'r') as f:
+                        self._entries = json.load(f)
+                except ValueError as e:
+                    logging.warning(f"Cache des marches {self.cache_file} illisible, ignore: {e}")
+        return self._entries
+
+    # Entree en cache de l'echange ({'saved_at', 'markets', 'currencies'}), perimee ou non
+    def load(self, exchange_name):
+        return self._read().get(exchange_name)
+
+    def age(self, exchange_name):
+        entry = self.load(exchange_name)
+        return time.time() - entry['saved_at'] if entry else None
+
+    # Secondes avant expiration de l'entree (0 si absente ou perimee)
+    def expires_in(self, exchange_name):
+        age = self.age(exchange_name)
+        return max(self.ttl - age, 0) if age is not None else 0
+
+    # Ecriture atomique: un arret brutal laisse l'ancien cache ou le nouveau
+    def save(self, exchange_name, markets, currencies=None):
+        entries = dict(self._read())
+        entries[exchange_name] = {'saved_at': time.time(), 'markets': markets, 'currencies': currencies}
+        save_json(self.cache_file, entries)
+        self._entries = entries
+        logging.info(f"{len(markets)} marches {exchange_name} sauvegardes dans {self.cache_file}.")
@@ -0,0 +1,452 @@
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+import time
+from urllib.parse import urlencode
+
+import aiohttp
+
+from exchange_clients import registry
+from metrics import metrics
+
+# Flux de marche en continu: dernier prix et meilleur bid/ask par symbole, alimentes par
+# les canaux publics WebSocket de MEXC (deals, bookTicker, depth). MEXC accepte au plus 30
+# abonnements par connexion: les symboles sont repartis sur plusieurs sockets. Un symbole n'est
+# servi par le flux qu'une fois son abonnement confirme par MEXC; sinon (socket tombee, abonnement
+# refuse ou pas encore confirme), son prix est rafraichi par REST.
+
+MEXC_WS_URL = 'wss://wbs.mexc.com/ws'
+MEXC_REST_URL = 'https://api.mexc.com'
+
+DEALS_CHANNEL = 'spot@public.deals.v3.api@{}'
+BOOK_TICKER_CHANNEL = 'spot@public.bookTicker.v3.api@{}'
+# 20 niveaux, la profondeur maximale du canal, pour le calcul du prix d'entree
+DEPTH_CHANNEL = 'spot@public.limit.depth.v3.api@{}@20'
+ORDERS_CHANNEL = 'spot@private.orders.v3.api'
+
+# Statuts des ordres du flux prive MEXC, traduits dans le vocabulaire ccxt
+ORDER_STATUSES = {1: 'open', 2: 'closed', 3: 'open', 4: 'canceled', 5: 'canceled'}
+
+
+# Abonnements acceptes par connexion (3 canaux par symbole)
+MAX_CHANNELS = 30
+
+
+# MEXC coupe les sockets silencieuses: un PING applicatif regulier les garde ouvertes
+async def keep_alive(ws, interval):
+    while True:
+        await asyncio.sleep(interval)
+        await ws.send_json({'method': 'PING'})
+
+
+# Une socket du flux et les symboles qui lui sont attribues
+class FeedConnection():
+    def __init__(self, number):
+        self.number = number
+        self.symbols = set()
+        self.ws = None
+        self.task = None
+        # ids des requetes envoyees sur cette socket et pas encore confirmees
+        self.requests = set()
+
+
+class MarketDataFeed():
+    def __init__(self, exchange, url=MEXC_WS_URL, rest_interval=1, ping_interval=20, max_backoff=30, pricing=None, recorder=None,
+                 max_channels=MAX_CHANNELS):
+        self.exchange = exchange
+        self.pricing = pricing
+        # MarketRecorder optionnel: chaque transaction, prix REST et carnet recu est enregistre
+        self.recorder = recorder
+        self.url = url
+        self.rest_interval = rest_interval
+        self.ping_interval = ping_interval
+        self.max_backoff = max_backoff
+        self.symbols_per_connection = max(max_channels // 3, 1)
+        self.prices = {}
+        self.books = {}
+        # Instant (time.perf_counter) de la derniere mise a jour du prix
+        self.updated_at = {}
+        self._symbols = set()
+        self._ids = {}
+        self._events = {}
+        self._listeners = []
+        self._connections = []
+        self._connection_of = {}
+        # Symbole -> canaux dont MEXC a confirme l'abonnement
+        self._live = {}
+        # id de requete -> (methode, canaux, connexion) en attente de l'accuse MEXC
+        self._requests = {}
+        self._request_id = 0
+        self._running = False
+        # Envois (abonnements) en cours: references gardees jusqu'a la fin de la tache
+        self._tasks = set()
+        if pricing is not None:
+            pricing.add_listener(self._on_ticker)
+
+    # Identifiant MEXC du symbole (BTC/USDT -> BTCUSDT), meme si le marche n'est pas encore liste
+    def market_id(self, symbol):
+        market = (self.exchange.market or {}).get(symbol)
+        market_id = market['id'] if market else symbol.replace('/', '')
+        return market_id.replace('_', '').upper()
+
+    def channels(self, symbol):
+        market_id = self.market_id(symbol)
+        return [DEALS_CHANNEL.format(market_id), BOOK_TICKER_CHANNEL.format(market_id), DEPTH_CHANNEL.format(market_id)]
+
+    # Au moins une socket ouverte
+    @property
+    def connected(self):
+        return any(connection.ws is not None for connection in self._connections)
+
+    # Symbole servi par le flux: au moins un canal confirme par MEXC
+    def live(self, symbol):
+        return bool(self._live.get(symbol))
+
+    def subscribe(self, symbol):
+        if symbol in self._symbols:
+            return
+        self._symbols.add(symbol)
+        self._ids[self.market_id(symbol)] = symbol
+        if not self.url:
+            return
+        connection = next((connection for connection in self._connections
+                           if len(connection.symbols) < self.symbols_per_connection), None)
+        if connection is None:
+            connection = FeedConnection(len(self._connections))
+            self._connections.append(connection)
+            if self._running:
+                connection.task = asyncio.create_task(self._run_connection(connection))
+        connection.symbols.add(symbol)
+        self._connection_of[symbol] = connection
+        if connection.ws is not None:
+            self._spawn(self._send(connection, 'SUBSCRIPTION', self.channels(symbol)))
+
+    def unsubscribe(self, symbol):
+        if symbol not in self._symbols:
+            return
+        self._symbols.discard(symbol)
+        self._ids.pop(self.market_id(symbol), None)
+        self.prices.pop(symbol, None)
+        self.books.pop(symbol, None)
+        self.updated_at.pop(symbol, None)
+        self._live.pop(symbol, None)
+        connection = self._connection_of.pop(symbol, None)
+        if connection is None:
+            return
+        connection.symbols.discard(symbol)
+        if connection.ws is not None:
+            self._spawn(self._send(connection, 'UNSUBSCRIPTION', self.channels(symbol)))
+
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._task_done)
+
+    def _task_done(self, task):
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logging.warning(f"Tache du flux WebSocket en erreur: {task.exception()}")
+
+    # callback(symbol, price) est appele a chaque nouveau prix, flux ou repli REST
+    def add_listener(self, callback):
+        self._listeners.append(callback)
+
+    def last_price(self, symbol):
+        return self.prices.get(symbol)
+
+    # Meilleur bid et meilleur ask connus, (None, None) si aucun carnet n'a ete recu
+    def top_of_book(self, symbol):
+        book = self.books.get(symbol)
+        if not book:
+            return None, None
+        bid = book['bids'][0][0] if book['bids'] else None
+        ask = book['asks'][0][0] if book['asks'] else None
+        return bid, ask
+
+    def order_book(self, symbol):
+        return self.books.get(symbol)
+
+    # Attendre la prochaine mise a jour du prix; None si rien n'arrive avant le timeout
+    async def wait_price(self, symbol, timeout=None):
+        event = self._events.setdefault(symbol, asyncio.Event())
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        return self.prices.get(symbol)
+
+    def _notify(self, symbol):
+        event = self._events.pop(symbol, None)
+        if event is not None:
+            event.set()
+
+    # Reveiller les taches qui attendent ce symbole sans nouveau prix (ex: listing detecte)
+    def wake(self, symbol):
+        self._notify(symbol)
+
+    def _update_price(self, symbol, price):
+        self.prices[symbol] = price
+        self.updated_at[symbol] = time.perf_counter()
+        for callback in self._listeners:
+            callback(symbol, price)
+        self._notify(symbol)
+
+    def _update_book(self, symbol, bids, asks, timestamp):
+        book = self.books.setdefault(symbol, {'bids': [], 'asks': [], 'timestamp': None})
+        if bids is not None:
+            book['bids'] = bids
+        if asks is not None:
+            book['asks'] = asks
+        book['timestamp'] = timestamp
+        if self.recorder is not None:
+            self.recorder.record_book(symbol, book, timestamp)
+        # Avant le premier trade, le meilleur ask sert de prix de reference
+        if symbol not in self.prices and book['asks']:
+            self._update_price(symbol, book['asks'][0][0])
+
+    # Accuse MEXC {'id', 'code', 'msg': 'canal1,canal2'}: seuls les canaux cites sont abonnes; un refus
+    # cite la raison dans msg (parfois avec code 0), les symboles concernes restent servis par REST
+    def _on_ack(self, message):
+        request = self._requests.pop(message.get('id'), None)
+        if request is None:
+            return
+        method, channels, connection = request
+        connection.requests.discard(message.get('id'))
+        msg = message.get('msg') or ''
+        accepted = set(msg.split(',')) & set(channels) if not message.get('code') else set()
+        for channel in channels:
+            symbol = self._ids.get(channel.split('@')[2])
+            if symbol is None:
+                continue
+            if method == 'UNSUBSCRIPTION' or channel not in accepted:
+                self._live.get(symbol, set()).discard(channel)
+            else:
+                self._live.setdefault(symbol, set()).add(channel)
+        rejected = [channel for channel in channels if channel not in accepted]
+        if method == 'SUBSCRIPTION' and rejected:
+            metrics.increment('ws_subscription_rejected_total', value=len(rejected))
+            logging.warning(f"Abonnement WebSocket refuse pour {len(rejected)} canaux ({msg}), repli REST pour ces symboles.")
+
+    def handle_message(self, message):
+        if 'code' in message and 'c' not in message:
+            self._on_ack(message)
+            return
+        channel = message.get('c')
+        data = message.get('d')
+        if not channel or data is None:
+            return
+        symbol = self._ids.get(message.get('s') or channel.split('@')[2])
+        if symbol is None:
+            return
+        timestamp = message.get('t')
+        if channel.startswith('spot@public.deals'):
+            deals = data.get('deals') or []
+            if self.recorder is not None:
+                for deal in deals:
+                    self.recorder.record_tick(symbol, float(deal['p']), float(deal['v']), deal.get('S'), deal.get('t') or timestamp)
+            if deals:
+                self._update_price(symbol, float(deals[-1]['p']))
+        elif channel.startswith('spot@public.bookTicker'):
+            bids = [[float(data['b']), float(data['B'])]] if data.get('b') else []
+            asks = [[float(data['a']), float(data['A'])]] if data.get('a') else []
+            book = self.books.get(symbol)
+            # Ne pas ecraser un carnet de profondeur plus complet avec le seul top of book
+            if book and len(book['bids']) > 1:
+                bids = bids + [level for level in book['bids'][1:] if not bids or level[0] < bids[0][0]]
+            if book and len(book['asks']) > 1:
+                asks = asks + [level for level in book['asks'][1:] if not asks or level[0] > asks[0][0]]
+            self._update_book(symbol, bids, asks, timestamp)
+        elif channel.startswith('spot@public.limit.depth'):
+            bids = [[float(level['p']), float(level['v'])] for level in data.get('bids', [])]
+            asks = [[float(level['p']), float(level['v'])] for level in data.get('asks', [])]
+            self._update_book(symbol, bids, asks, timestamp)
+
+    async def _send(self, connection, method, params):
+        if connection.ws is None:
+            return
+        self._request_id += 1
+        request_id = self._request_id
+        self._requests[request_id] = (method, params, connection)
+        connection.requests.add(request_id)
+        try:
+            await connection.ws.send_json({'method': method, 'params': params, 'id': request_id})
+        except Exception as e:
+            self._requests.pop(request_id, None)
+            connection.requests.discard(request_id)
+            logging.warning(f"Envoi WebSocket {method} impossible: {e}")
+
+    async def _stream(self, connection):
+        async with registry.session().ws_connect(self.url, autoping=True) as ws:
+            connection.ws = ws
+            logging.info(f"Flux WebSocket {connection.number} connecte a {self.url} ({len(connection.symbols)} symboles)")
+            ping_task = asyncio.create_task(keep_alive(ws, self.ping_interval))
+            try:
+                channels = [channel for symbol in connection.symbols for channel in self.channels(symbol)]
+                if channels:
+                    await self._send(connection, 'SUBSCRIPTION', channels)
+                async for msg in ws:
+                    if msg.type == aiohttp.WSMsgType.TEXT:
+                        with metrics.timer('loop_phase_seconds', phase='ws_message'):
+                            self.handle_message(json.loads(msg.data))
+                    elif msg.type in (aiohttp.WSMsgType.CLOSED, aiohttp.WSMsgType.ERROR):
+                        break
+            finally:
+                ping_task.cancel()
+                connection.ws = None
+                for symbol in connection.symbols:
+                    self._live.pop(symbol, None)
+                # Requetes sans accuse: perimees, un accuse tardif ne doit plus etre apparie
+                for request_id in connection.requests:
+                    self._requests.pop(request_id, None)
+                connection.requests.clear()
+
+    # Tickers REST diffuses par le PricingService: prix et meilleur bid/ask des symboles hors flux
+    def _on_ticker(self, symbol, ticker):
+        if self.live(symbol) or symbol not in self._symbols:
+            return
+        bids = [[ticker['bid'], ticker.get('bidVolume') or 0]] if ticker.get('bid') else []
+        asks = [[ticker['ask'], ticker.get('askVolume') or 0]] if ticker.get('ask') else []
+        if bids or asks:
+            self._update_book(symbol, bids, asks, ticker.get('timestamp'))
+        if ticker.get('last'):
+            if self.recorder is not None:
+                self.recorder.record_tick(symbol, ticker['last'], timestamp=ticker.get('timestamp'))
+            self._update_price(symbol, ticker['last'])
+
+    # Repli REST: un seul fetch_tickers par tick pour tous les symboles suivis sans abonnement confirme
+    async def _rest_fallback(self):
+        while True:
+            symbols = [symbol for symbol in self._symbols if not self.live(symbol)]
+            if symbols:
+                metrics.increment('rest_fallback_ticks_total')
+                if self.pricing is not None:
+                    await self.pricing.refresh(symbols)
+                else:
+                    for symbol in symbols:
+                        if symbol in (self.exchange.market or {}):
+                            price = await self.exchange.get_price(symbol)
+                            if price:
+                                if self.recorder is not None:
+                                    self.recorder.record_tick(symbol, price)
+                                self._update_price(symbol, price)
+            await asyncio.sleep(self.rest_interval)
+
+    # Une socket et ses reconnexions; elle reste ouverte sans symbole pour les suivants
+    async def _run_connection(self, connection):
+        backoff = 1
+        while True:
+            started = time.time()
+            try:
+                await self._stream(connection)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.warning(f"Flux WebSocket {connection.number} interrompu: {e}. Repli sur REST.")
+            if time.time() - started > self.max_backoff:
+                backoff = 1
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, self.max_backoff)
+
+    async def run(self):
+        fallback = asyncio.create_task(self._rest_fallback())
+        try:
+            if not self.url:
+                await fallback
+                return
+            self._running = True
+            if not self._connections:
+                self._connections.append(FeedConnection(0))
+            for connection in self._connections:
+                connection.task = asyncio.create_task(self._run_connection(connection))
+            await fallback
+        finally:
+            self._running = False
+            fallback.cancel()
+            tasks = [connection.task for connection in self._connections if connection.task is not None]
+            for connection in self._connections:
+                connection.task = None
+            for task in tasks:
+                task.cancel()
+            # Fermeture propre des sockets avant de rendre la main
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+
+# Flux prive des ordres (listenKey MEXC): chaque mise a jour est transmise a on_order_update
+# sous la forme {'id', 'status', 'filled', 'average'}, comme un ordre ccxt partiel.
+class UserDataStream():
+    def __init__(self, apiKey, secret, on_order_update=None, url=MEXC_WS_URL, rest_url=MEXC_REST_URL,
+                 ping_interval=20, keepalive_interval=1800, max_backoff=30):
+        self.apiKey = apiKey
+        self.secret = secret
+        self.on_order_update = on_order_update
+        self.url = url
+        self.rest_url = rest_url
+        self.ping_interval = ping_interval
+        self.keepalive_interval = keepalive_interval
+        self.max_backoff = max_backoff
+        self.connected = False
+
+    async def _signed(self, method, params=None):
+        params = dict(params or {}, timestamp=int(time.time() * 1000))
+        query = urlencode(params)
+        signature = hmac.new(self.secret.encode(), query.encode(), hashlib.sha256).hexdigest()
+        url = f"{self.rest_url}/api/v3/userDataStream?{query}&signature={signature}"
+        await registry.throttle('mexc', method, url)
+        headers = {'X-MEXC-APIKEY': self.apiKey, 'Content-Type': 'application/json'}
+        async with registry.session().request(method, url, headers=headers) as response:
+            data = await response.json(content_type=None)
+            if response.status != 200:
+                raise Exception(f"userDataStream {method} {response.status}: {data}")
+            return data
+
+    # La listenKey expire apres 60 minutes sans prolongation
+    async def _extend(self, listen_key):
+        while True:
+            await asyncio.sleep(self.keepalive_interval)
+            await self._signed('PUT', {'listenKey': listen_key})
+
+    @staticmethod
+    def parse_order(data):
+        return {
+            'id': str(data.get('i')),
+            'status': ORDER_STATUSES.get(data.get('s'), 'open'),
+            'filled': float(data.get('cv') or 0),
+            'average': float(data['ap']) if data.get('ap') else None,
+        }
+
+    async def _stream(self):
+        listen_key = (await self._signed('POST'))['listenKey']
+        async with registry.session().ws_connect(f"{self.url}?listenKey={listen_key}", autoping=True) as ws:
+            self.connected = True
+            logging.info("Flux prive des ordres connecte")
+            tasks = [asyncio.create_task(keep_alive(ws, self.ping_interval)), asyncio.create_task(self._extend(listen_key))]
+            try:
+                await ws.send_json({'method': 'SUBSCRIPTION', 'params': [ORDERS_CHANNEL]})
+                async for msg in ws:
+                    if msg.type == aiohttp.WSMsgType.TEXT:
+                        message = json.loads(msg.data)
+                        if message.get('c') == ORDERS_CHANNEL and message.get('d') and self.on_order_update:
+                            self.on_order_update(self.parse_order(message['d']))
+                    elif msg.type in (aiohttp.WSMsgType.CLOSED, aiohttp.WSMsgType.ERROR):
+                        break
+            finally:
+                for task in tasks:
+                    task.cancel()
+                self.connected = False
+
+    async def run(self):
+        backoff = 1
+        while True:
+            started = time.time()
+            try:
+                await self._stream()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.warning(f"Flux prive des ordres interrompu: {e}. Suivi des ordres par REST.")
+            if time.time() - started > self.max_backoff:
+                backoff = 1
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, self.max_backoff)
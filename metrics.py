@@ -0,0 +1,168 @@
+import functools
+import inspect
+import logging
+import time
+from collections import deque
+
+from aiohttp import web
+
+# Instrumentation des latences: chronometrage des appels a l'echange et des phases de chaque
+# boucle, quantiles p50/p99 sur les derniers echantillons, et page /metrics au format texte
+# Prometheus sur un port local. Desactivee, chaque mesure se resume a un test de booleen.
+
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+class Summary():
+    def __init__(self, max_samples=2048):
+        self.samples = deque(maxlen=max_samples)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.samples.append(value)
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        if not self.samples:
+            return float('nan')
+        ordered = sorted(self.samples)
+        return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels) + "}"
+
+
+class Timer():
+    def __init__(self, metrics, name, labels):
+        self.metrics = metrics
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.name, time.perf_counter() - self.start, **self.labels)
+
+
+class NullTimer():
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return None
+
+
+NULL_TIMER = NullTimer()
+
+
+class Metrics():
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.summaries = {}
+        self.counters = {}
+        self._gauges = []
+        self._runner = None
+
+    def observe(self, name, seconds, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        summary = self.summaries.get(key)
+        if summary is None:
+            summary = self.summaries[key] = Summary()
+        summary.observe(seconds)
+
+    def increment(self, name, value=1, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    # with metrics.timer('loop_phase_seconds', phase='...'): ...
+    def timer(self, name, **labels):
+        if not self.enabled:
+            return NULL_TIMER
+        return Timer(self, name, labels)
+
+    # callback() renvoie une liste de (nom, {labels}, valeur), lue a chaque requete /metrics
+    def add_gauge(self, callback):
+        self._gauges.append(callback)
+
+    # Decorateur: duree de chaque appel, synchrone ou asynchrone, etiquetee par le nom de la methode
+    def timed(self, name, **labels):
+        def decorator(fn):
+            fn_labels = dict(labels, method=fn.__name__)
+            if inspect.iscoroutinefunction(fn):
+                @functools.wraps(fn)
+                async def async_wrapped(*args, **kwargs):
+                    if not self.enabled:
+                        return await fn(*args, **kwargs)
+                    start = time.perf_counter()
+                    try:
+                        return await fn(*args, **kwargs)
+                    finally:
+                        self.observe(name, time.perf_counter() - start, **fn_labels)
+                return async_wrapped
+
+            @functools.wraps(fn)
+            def wrapped(*args, **kwargs):
+                if not self.enabled:
+                    return fn(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    self.observe(name, time.perf_counter() - start, **fn_labels)
+            return wrapped
+        return decorator
+
+    def render(self):
+        lines = []
+        typed = set()
+        for (name, labels), summary in sorted(self.summaries.items()):
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} summary")
+            for q in QUANTILES:
+                lines.append(f"{name}{format_labels(labels + (('quantile', q),))} {summary.quantile(q)}")
+            lines.append(f"{name}_sum{format_labels(labels)} {summary.sum}")
+            lines.append(f"{name}_count{format_labels(labels)} {summary.count}")
+        for (name, labels), value in sorted(self.counters.items()):
+            lines.append(f"{name}{format_labels(labels)} {value}")
+        for callback in self._gauges:
+            try:
+                for name, labels, value in callback():
+                    lines.append(f"{name}{format_labels(tuple(sorted(labels.items())))} {value}")
+            except Exception as e:
+                logging.error(f"Erreur lors de la lecture d'une metrique: {e}")
+        return "\n".join(lines) + "\n"
+
+    async def _handle(self, request):
+        return web.Response(text=self.render(), content_type='text/plain')
+
+    # Serveur HTTP local; port 0 ou None laisse l'instrumentation desactivee
+    async def start(self, port, host='127.0.0.1'):
+        if not port:
+            return
+        self.enabled = True
+        app = web.Application()
+        app.router.add_get('/metrics', self._handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+        logging.info(f"Metriques disponibles sur http://{host}:{port}/metrics")
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+metrics = Metrics()
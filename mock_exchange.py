@@ -0,0 +1,239 @@
+import asyncio
+import itertools
+import logging
+import time
+
+from aiohttp import web
+
+from replay_server import ReplayServer
+
+# Echange MEXC simule pour les benchmarks et les tests de charge, sur un seul serveur local:
+# - les endpoints REST v2 utilises par ccxt (marches, ticker, solde, ordres),
+# - la liste legere /api/v3/defaultSymbols de la surveillance des listings,
+# - les canaux WebSocket publics (herites de ReplayServer), alimentes par le script du benchmark,
+# - l'API Telegram (sendMessage, getUpdates en long polling).
+# Chaque ordre recu et chaque message Telegram est horodate (time.perf_counter) pour mesurer
+# les latences de bout en bout depuis le meme processus.
+
+MEXC_V2_PATH = '/open/api/v2'
+
+
+def _mexc_time():
+    return int(time.time() * 1000)
+
+
+class MockExchange(ReplayServer):
+    # fill_delay: delai d'execution des ordres en secondes (None: jamais executes)
+    def __init__(self, balance=1000.0, fill_delay=0.0, host='127.0.0.1', port=0):
+        super().__init__(host=host, port=port, speed=0)
+        self.balance = balance
+        self.fill_delay = fill_delay
+        self.http_url = None
+        self.requests = 0
+        self.markets = {}
+        self.prices = {}
+        self.orders = {}
+        self.order_log = []
+        self.telegram_messages = []
+        self._updates = []
+        self._updates_changed = None
+        self._order_ids = itertools.count(1)
+        self._update_ids = itertools.count(1)
+        self._order_waiters = []
+
+    async def start(self):
+        url = await super().start()
+        self.http_url = url.replace('ws://', 'http://', 1)[:-len('/ws')]
+        return url
+
+    def _add_routes(self, app):
+        super()._add_routes(app)
+        app.middlewares.append(self._count)
+        app.router.add_get(f'{MEXC_V2_PATH}/market/symbols', self._symbols)
+        app.router.add_get(f'{MEXC_V2_PATH}/market/api_default_symbols', self._default_symbols)
+        app.router.add_get(f'{MEXC_V2_PATH}/market/coin/list', self._coins)
+        app.router.add_get(f'{MEXC_V2_PATH}/market/ticker', self._ticker)
+        app.router.add_get(f'{MEXC_V2_PATH}/account/info', self._account)
+        app.router.add_post(f'{MEXC_V2_PATH}/order/place', self._place)
+        app.router.add_get(f'{MEXC_V2_PATH}/order/query', self._query)
+        app.router.add_delete(f'{MEXC_V2_PATH}/order/cancel', self._cancel)
+        app.router.add_get('/api/v3/defaultSymbols', self._default_symbols_v3)
+        app.router.add_post('/bot{token}/sendMessage', self._send_message)
+        app.router.add_get('/bot{token}/getUpdates', self._get_updates)
+
+    @web.middleware
+    async def _count(self, request, handler):
+        self.requests += 1
+        return await handler(request)
+
+    # --- Script du benchmark ---
+
+    # Marche connu du REST, sans message sur le flux
+    def add_market(self, symbol, price, price_scale=6, quantity_scale=2):
+        self.markets[symbol.replace('/', '_')] = {'price_scale': price_scale, 'quantity_scale': quantity_scale}
+        self.prices[symbol] = price
+
+    # Listing: le marche apparait cote REST puis le carnet et une premiere transaction sont publies.
+    # Renvoie l'instant du listing (time.perf_counter).
+    async def list_market(self, symbol, price, volume=1000.0, levels=5):
+        listed_at = time.perf_counter()
+        self.add_market(symbol, price)
+        await self.publish_book(symbol, price, volume, levels)
+        await self.publish_deal(symbol, price)
+        return listed_at
+
+    async def publish_deal(self, symbol, price, volume=1.0, side=1):
+        market_id = symbol.replace('/', '')
+        now = _mexc_time()
+        self.prices[symbol] = price
+        await self.publish({'c': f'spot@public.deals.v3.api@{market_id}', 's': market_id, 't': now,
+                            'd': {'deals': [{'p': str(price), 'v': str(volume), 'S': side, 't': now}]}})
+
+    async def publish_book(self, symbol, price, volume=1000.0, levels=5, spread=0.001):
+        market_id = symbol.replace('/', '')
+        bids = [{'p': str(round(price * (1 - spread * k), 6)), 'v': str(volume)} for k in range(1, levels + 1)]
+        asks = [{'p': str(round(price * (1 + spread * (k - 1)), 6)), 'v': str(volume)} for k in range(1, levels + 1)]
+        await self.publish({'c': f'spot@public.limit.depth.v3.api@{market_id}@20', 's': market_id, 't': _mexc_time(),
+                            'd': {'bids': bids, 'asks': asks}})
+
+    def subscribed(self, channel):
+        return any(channel in channels for channels in self._clients.values())
+
+    async def wait_subscription(self, channel, timeout=10):
+        deadline = time.perf_counter() + timeout
+        while not self.subscribed(channel):
+            if time.perf_counter() > deadline:
+                raise TimeoutError(f"Aucun abonnement a {channel}.")
+            await asyncio.sleep(0.005)
+
+    # Prochain ordre recu pour ce symbole et ce cote: {'id', 'symbol', 'side', 'received_at', 'filled_at'}
+    async def wait_order(self, symbol, side, timeout=10):
+        for entry in self.order_log:
+            if entry['symbol'] == symbol and entry['side'] == side and not entry.get('seen'):
+                entry['seen'] = True
+                return entry
+        future = asyncio.get_running_loop().create_future()
+        self._order_waiters.append((symbol, side, future))
+        entry = await asyncio.wait_for(future, timeout)
+        entry['seen'] = True
+        return entry
+
+    def fill(self, order_id):
+        order = self.orders.get(order_id)
+        if order is None or order['state'] != 'NEW':
+            return
+        quantity = float(order['quantity'])
+        amount = quantity * float(order['price'])
+        order.update({'state': 'FILLED', 'deal_quantity': order['quantity'], 'deal_amount': str(amount)})
+        self.balance += -amount if order['type'] == 'BID' else amount
+        for entry in self.order_log:
+            if entry['id'] == order_id:
+                entry['filled_at'] = time.perf_counter()
+
+    # Commande Telegram mise a disposition de getUpdates; renvoie l'instant d'envoi
+    def push_command(self, text, chat_id):
+        self._updates.append({'update_id': next(self._update_ids), 'message': {'text': text, 'chat': {'id': chat_id}}})
+        if self._updates_changed is not None:
+            self._updates_changed.set()
+        return time.perf_counter()
+
+    # --- REST MEXC v2 ---
+
+    @staticmethod
+    def _json(data, code=200):
+        return web.json_response({'code': code, 'data': data})
+
+    async def _symbols(self, request):
+        return self._json([{'symbol': market_id, 'state': 'ENABLED', 'price_scale': market['price_scale'],
+                            'quantity_scale': market['quantity_scale'], 'min_amount': '1', 'max_amount': '5000000',
+                            'maker_fee_rate': '0.002', 'taker_fee_rate': '0.002'} for market_id, market in self.markets.items()])
+
+    async def _default_symbols(self, request):
+        return self._json({'symbol': list(self.markets)})
+
+    async def _default_symbols_v3(self, request):
+        return self._json([market_id.replace('_', '') for market_id in self.markets])
+
+    async def _coins(self, request):
+        return self._json([])
+
+    async def _ticker(self, request):
+        market_id = request.query.get('symbol')
+        tickers = []
+        for symbol, price in self.prices.items():
+            if market_id and symbol.replace('/', '_') != market_id:
+                continue
+            tickers.append({'symbol': symbol.replace('/', '_'), 'last': str(price), 'bid': str(price), 'ask': str(price),
+                            'volume': '0', 'time': _mexc_time()})
+        return self._json(tickers)
+
+    async def _account(self, request):
+        return self._json({'USDT': {'available': str(self.balance), 'frozen': '0'}})
+
+    async def _place(self, request):
+        received_at = time.perf_counter()
+        body = await request.json()
+        if body['symbol'] not in self.markets:
+            return web.json_response({'code': 30014, 'msg': 'Invalid symbol'})
+        order_id = f"{next(self._order_ids):032x}"
+        self.orders[order_id] = {'id': order_id, 'symbol': body['symbol'], 'price': body['price'], 'quantity': body['quantity'],
+                                 'state': 'NEW', 'type': body['trade_type'], 'deal_quantity': '0', 'deal_amount': '0',
+                                 'create_time': _mexc_time(), 'order_type': body['order_type']}
+        entry = {'id': order_id, 'symbol': body['symbol'].replace('_', '/'), 'side': 'buy' if body['trade_type'] == 'BID' else 'sell',
+                 'received_at': received_at, 'filled_at': None}
+        self.order_log.append(entry)
+        for waiter in list(self._order_waiters):
+            symbol, side, future = waiter
+            if symbol == entry['symbol'] and side == entry['side'] and not future.done():
+                self._order_waiters.remove(waiter)
+                future.set_result(entry)
+                break
+        if self.fill_delay is not None:
+            asyncio.get_running_loop().call_later(self.fill_delay, self.fill, order_id)
+        return self._json(order_id)
+
+    async def _query(self, request):
+        order = self.orders.get(request.query.get('order_ids'))
+        return self._json([order] if order else [])
+
+    async def _cancel(self, request):
+        order_id = request.query.get('order_ids')
+        order = self.orders.get(order_id)
+        if order is not None and order['state'] == 'NEW':
+            order['state'] = 'CANCELED'
+        return self._json({order_id: 'success'})
+
+    # --- API Telegram ---
+
+    async def _send_message(self, request):
+        payload = await request.json()
+        self.telegram_messages.append((time.perf_counter(), payload.get('text')))
+        return web.json_response({'ok': True, 'result': {'message_id': len(self.telegram_messages)}})
+
+    async def _get_updates(self, request):
+        offset = int(request.query.get('offset', 0))
+        timeout = float(request.query.get('timeout', 0))
+        self._updates = [update for update in self._updates if update['update_id'] >= offset]
+        if not self._updates and timeout:
+            self._updates_changed = asyncio.Event()
+            try:
+                await asyncio.wait_for(self._updates_changed.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return web.json_response({'ok': True, 'result': self._updates})
+
+
+if __name__ == '__main__':
+    logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO)
+
+    async def serve():
+        server = MockExchange()
+        server.port = 8765
+        await server.start()
+        logging.info(f"REST et Telegram simules sur {server.http_url}")
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await server.stop()
+
+    asyncio.run(serve())
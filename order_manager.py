@@ -0,0 +1,248 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+
+from log_pipeline import event
+from metrics import metrics
+
+# Suivi non bloquant des ordres: chaque ordre envoye renvoie un OrderHandle dont l'etat
+# (remplissage partiel, prix moyen) est mis a jour par le flux prive des ordres, avec un
+# sondage REST adaptatif en secours. Un ordre non execute a temps est annule puis
+# eventuellement remplace a un nouveau prix.
+
+FINAL_STATUSES = ('closed', 'canceled', 'rejected', 'expired')
+
+
+# price_cap: prix maximal d'un achat, remplacements compris (None: pas de plafond)
+class OrderHandle():
+    def __init__(self, symbol, side, amount, price, price_cap=None):
+        self.symbol = symbol
+        self.side = side
+        self.amount = amount
+        self.price = price
+        self.price_cap = price_cap
+        self.order_id = None
+        self.order_ids = []
+        self.status = 'open'
+        self.filled = 0.0
+        self.average = None
+        self.replaces = 0
+        self.submitted_at = time.perf_counter()
+        self._reprice = False
+        self._filled_before = 0.0
+        self._cost_before = 0.0
+        self._current_filled = 0.0
+        self._current_average = None
+        self._done = asyncio.get_running_loop().create_future()
+        self._changed = asyncio.Event()
+        self._listeners = []
+
+    @property
+    def remaining(self):
+        return max(self.amount - self.filled, 0.0)
+
+    # Part executee de la quantite demandee, entre 0 et 1
+    @property
+    def progress(self):
+        return self.filled / self.amount if self.amount else 0.0
+
+    def done(self):
+        return self._done.done()
+
+    def add_listener(self, callback):
+        self._listeners.append(callback)
+
+    # Demander le remplacement immediat de l'ordre en cours, sans attendre le timeout
+    def reprice_now(self):
+        if not self.done():
+            self._reprice = True
+            self._changed.set()
+
+    async def wait(self, timeout=None):
+        await asyncio.wait_for(asyncio.shield(self._done), timeout)
+        return self
+
+    async def _wait_change(self, timeout):
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self._changed.clear()
+
+    # Appliquer un ordre ccxt (ou une mise a jour du flux prive) a l'ordre en cours
+    def _apply(self, order):
+        filled = float(order.get('filled') or 0)
+        if filled < self._current_filled and order.get('status') not in FINAL_STATUSES:
+            return
+        self._current_filled = filled
+        self._current_average = order.get('average') or order.get('price') or self._current_average or self.price
+        self.filled = self._filled_before + filled
+        cost = self._cost_before + filled * self._current_average
+        self.average = cost / self.filled if self.filled else None
+        if order.get('status'):
+            self.status = order['status']
+        self._changed.set()
+        for callback in self._listeners:
+            callback(self)
+
+    def _track(self, order_id):
+        self.order_id = str(order_id)
+        self.order_ids.append(self.order_id)
+        self.status = 'open'
+
+    # Un remplacement repart de zero pour le nouvel ordre, en gardant ce qui a deja ete execute
+    def _start_replacement(self):
+        self._filled_before = self.filled
+        self._cost_before = self.filled * (self.average or 0)
+        self._current_filled = 0.0
+        self._current_average = None
+        self.replaces += 1
+
+    def _finish(self, status=None):
+        if status:
+            self.status = status
+        elif self.status not in FINAL_STATUSES:
+            self.status = 'canceled'
+        if not self._done.done():
+            self._done.set_result(self)
+        for callback in self._listeners:
+            callback(self)
+
+
+class OrderManager():
+    # Les mises a jour d'ordres inconnus (en avance sur create_order, ou ordres passes hors du bot) ne
+    # sont gardees que early_update_ttl secondes, et au plus max_early_updates a la fois
+    def __init__(self, exchange, user_stream=None, poll_min=0.5, poll_max=5, recorder=None, early_update_ttl=60, max_early_updates=100):
+        self.exchange = exchange
+        self.user_stream = user_stream
+        # MarketRecorder optionnel: chaque changement d'etat d'un ordre est enregistre
+        self.recorder = recorder
+        self.poll_min = poll_min
+        self.poll_max = poll_max
+        self.early_update_ttl = early_update_ttl
+        self.max_early_updates = max_early_updates
+        self._handles = {}
+        # id -> (instant de reception, mise a jour), du plus ancien au plus recent
+        self._early_updates = OrderedDict()
+        # Ordres termines par ce gestionnaire: leurs mises a jour tardives sont ignorees
+        self._finished = OrderedDict()
+
+    def _stream_connected(self):
+        return self.user_stream is not None and self.user_stream.connected
+
+    # Mises a jour du flux prive; celles qui precedent la reponse de create_order sont gardees
+    def on_order_update(self, update):
+        handle = self._handles.get(update['id'])
+        if handle is None:
+            if update['id'] not in self._finished:
+                self._keep_early(update)
+        elif update['id'] == handle.order_id:
+            handle._apply(update)
+
+    def _keep_early(self, update):
+        now = time.monotonic()
+        self._early_updates.pop(update['id'], None)
+        self._early_updates[update['id']] = (now, update)
+        while self._early_updates:
+            received_at, _ = next(iter(self._early_updates.values()))
+            if len(self._early_updates) <= self.max_early_updates and now - received_at <= self.early_update_ttl:
+                break
+            self._early_updates.popitem(last=False)
+
+    def _register(self, handle, order):
+        handle._track(order['id'])
+        self._handles[handle.order_id] = handle
+        handle._apply(order)
+        early = self._early_updates.pop(handle.order_id, None)
+        if early is not None:
+            handle._apply(early[1])
+
+    # Envoyer un ordre limite et rendre la main immediatement; le suivi tourne en tache de fond.
+    # reprice(handle) renvoie le prix du remplacement (ou None) quand le timeout expire ou sur
+    # handle.reprice_now(); max_replaces=None autorise un nombre illimite de remplacements.
+    # params (ex: timeInForce) est transmis a create_order, remplacements compris; price_cap est
+    # garde sur le handle pour les remplacements.
+    async def submit(self, symbol, side, quantity, price, timeout=None, reprice=None, max_replaces=0, detected_at=None, params=None,
+                     price_cap=None):
+        handle = OrderHandle(symbol, side, quantity, price, price_cap)
+        if self.recorder is not None:
+            handle.add_listener(self.recorder.record_order)
+        order = await self.exchange.place_order(symbol, side, quantity, price, detected_at=detected_at, params=params)
+        if order is None:
+            if self.exchange.dry_run:
+                handle._apply({'status': 'closed', 'filled': quantity, 'average': price})
+                handle._finish('closed')
+            else:
+                handle._finish('rejected')
+            return handle
+        self._register(handle, order)
+        asyncio.create_task(self._follow(handle, timeout, reprice, max_replaces, params))
+        return handle
+
+    async def _refresh(self, handle):
+        order = await self.exchange.fetch_order(handle.order_id, handle.symbol)
+        if order is not None:
+            handle._apply(order)
+
+    async def _follow(self, handle, timeout, reprice, max_replaces, params=None):
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                deadline = loop.time() + timeout if timeout else None
+                interval = self.poll_min
+                while handle.status not in FINAL_STATUSES:
+                    # Avec le flux prive, le REST ne sert plus que de filet de securite
+                    wait = self.poll_max if self._stream_connected() else interval
+                    if deadline is not None:
+                        wait = min(wait, max(deadline - loop.time(), 0))
+                    if not await handle._wait_change(wait):
+                        filled = handle.filled
+                        await self._refresh(handle)
+                        interval = self.poll_min if handle.filled != filled else min(interval * 1.5, self.poll_max)
+                    if handle.status in FINAL_STATUSES or handle._reprice or (deadline is not None and loop.time() >= deadline):
+                        break
+
+                if handle.status in FINAL_STATUSES:
+                    break
+
+                # Timeout ou marche qui s'eloigne: annuler, relire l'etat final puis remplacer le reste si demande
+                if handle._reprice:
+                    logging.info("Ordre %s %s %s depasse par le marche (%.0f%%). Annulation.", handle.order_id, handle.side, handle.symbol,
+                                 handle.progress * 100, extra=event('order_cancel', symbol=handle.symbol, order_id=handle.order_id, reason='reprice'))
+                else:
+                    logging.info("Ordre %s %s %s non execute apres %ss (%.0f%%). Annulation.", handle.order_id, handle.side, handle.symbol,
+                                 timeout, handle.progress * 100, extra=event('order_cancel', symbol=handle.symbol, order_id=handle.order_id, reason='timeout'))
+                handle._reprice = False
+                await self.exchange.cancel_order(handle.order_id, handle.symbol)
+                await self._refresh(handle)
+                if handle.status == 'closed':
+                    break
+                remaining = float(self.exchange.convert_amount_to_precision(handle.symbol, handle.remaining)) if handle.remaining else 0.0
+                if not remaining or reprice is None or (max_replaces is not None and handle.replaces >= max_replaces):
+                    break
+                new_price = await reprice(handle)
+                if not new_price:
+                    break
+                handle._start_replacement()
+                handle.price = new_price
+                order = await self.exchange.place_order(handle.symbol, handle.side, remaining, new_price, params=params)
+                if order is None:
+                    break
+                logging.info("Ordre %s %s remplace: %s a %s (remplacement %s).", handle.side, handle.symbol, remaining, new_price, handle.replaces,
+                             extra=event('order_replace', symbol=handle.symbol, amount=remaining, price=new_price, replaces=handle.replaces))
+                self._register(handle, order)
+                handle._reprice = False
+        except Exception as e:
+            logging.error(f"Erreur lors du suivi de l'ordre {handle.order_id} pour {handle.symbol}: {e}")
+        finally:
+            for order_id in handle.order_ids:
+                self._handles.pop(order_id, None)
+                self._finished[order_id] = None
+            while len(self._finished) > self.max_early_updates * 10:
+                self._finished.popitem(last=False)
+            if handle.filled:
+                metrics.observe('order_to_fill_seconds', time.perf_counter() - handle.submitted_at, side=handle.side)
+            handle._finish('closed' if handle.remaining <= 0 or handle.status == 'closed' else None)
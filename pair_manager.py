@@ -0,0 +1,538 @@
+import asyncio
+import logging
+import time
+from datetime import datetime
+from enum import Enum
+
+from entry_pricing import EntryPricer
+from listing_watch import normalize_symbol
+from log_pipeline import event
+from metrics import metrics
+from stop_engine import StopEngine, StopRule
+from telegram_notifier import STATUS, TRADE
+
+# Sniping de plusieurs paires en parallele: chaque paire suit sa propre machine a etats
+# WAITING -> ARMED -> BUYING -> HOLDING -> SELLING -> DONE dans une tache independante.
+# Le PairManager repartit le capital entre les paires et partage les rechargements de marches,
+# declenches par la surveillance des listings plutot que par un sondage periodique.
+
+
+class PairState(Enum):
+    WAITING = 'waiting'    # marche inconnu, attente du listing
+    ARMED = 'armed'        # marche charge et budget reserve, attente du premier prix
+    BUYING = 'buying'      # ordre d'achat en cours
+    HOLDING = 'holding'    # position ouverte, stop suiveur actif
+    SELLING = 'selling'    # ordre de vente en cours
+    DONE = 'done'
+
+
+ACTIVE_STATES = (PairState.BUYING, PairState.HOLDING, PairState.SELLING)
+
+
+# Etat "arme" d'une paire: tout ce qui peut etre prepare avant le listing l'est,
+# pour que create_order soit le seul appel reseau au moment d'acheter
+class ArmedPair():
+    def __init__(self, symbol, fee_percentage):
+        self.symbol = symbol
+        self.fee_percentage = fee_percentage
+        self.market = None
+        self.budget = None
+        self.armed_at = time.time()
+
+    # Precharger les metadonnees du marche (precision, limites) si la paire est connue
+    def load_market(self, markets):
+        if self.market is None and markets:
+            self.market = markets.get(self.symbol)
+        return self.market is not None
+
+    # Construire l'ordre a partir du gabarit; aucun appel reseau ici. Avec un carnet, le prix
+    # est celui qui couvre le budget dans la limite de glissement de l'EntryPricer. Sans carnet, le
+    # plafond part du dernier prix: les modes ioc et aggressive envoient l'ordre a ce plafond,
+    # le mode limit au dernier prix.
+    def build_order(self, exchange, price, book=None, pricer=None):
+        if self.budget is None or not price:
+            raise ValueError(f"Aucun budget disponible pour {self.symbol}.")
+        spend = self.budget * (1 - self.fee_percentage)
+        price_cap = None
+        if pricer is not None and (book or {}).get('asks'):
+            quote = pricer.quote(book, budget=spend)
+            if quote is None:
+                raise ValueError(f"Aucun ask de {self.symbol} sous la limite de glissement de {pricer.max_slippage:.1%}.")
+            price = quote['price']
+            price_cap = quote['price_cap']
+            logging.info("Prix d'entree %s: %s (%s), prix moyen estime %s, glissement %.2f%%%s", self.symbol, price, pricer.mode,
+                         quote['average'], quote['slippage'] * 100, '' if quote['complete'] else ', profondeur insuffisante',
+                         extra=event('entry_price', symbol=self.symbol, price=price, average=quote['average'], slippage=quote['slippage']))
+        elif pricer is not None:
+            price_cap = pricer.price_cap(None, last_price=price)
+            if pricer.mode != 'limit':
+                price = price_cap
+            logging.info("Prix d'entree %s: %s (%s), pas encore de carnet, plafond %s", self.symbol, price, pricer.mode, price_cap,
+                         extra=event('entry_price', symbol=self.symbol, price=price, price_cap=price_cap, book=False))
+        quantity = spend / price
+        quantity = float(exchange.convert_amount_to_precision(self.symbol, quantity))
+        price = float(exchange.convert_price_to_precision(self.symbol, price))
+        min_amount = (self.market or {}).get('limits', {}).get('amount', {}).get('min')
+        if quantity <= 0 or (min_amount and quantity < min_amount):
+            raise ValueError(f"Quantite {quantity} {self.symbol} inferieure au minimum ({min_amount}) pour un budget de {self.budget} USDT.")
+        return {'symbol': self.symbol, 'side': 'buy', 'quantity': quantity, 'price': price, 'price_cap': price_cap}
+
+
+# Prix de remplacement d'un ordre non execute: meilleur ask pour un achat, meilleur bid pour une vente.
+# Pour un achat avec un EntryPricer, le carnet est parcouru pour la quantite restante, sans depasser
+# le plafond de l'ordre d'origine (handle.price_cap; None: plus de remplacement). A defaut de flux,
+# le ticker vient du PricingService.
+def book_repricer(symbol, exchange, feed=None, pricing=None, pricer=None):
+    async def reprice(handle):
+        price_cap = handle.price_cap
+        if pricer is not None and handle.side == 'buy' and price_cap is None:
+            return None
+        price = None
+        if pricer is not None and feed is not None and handle.side == 'buy' and (feed.order_book(symbol) or {}).get('asks'):
+            quote = pricer.quote(feed.order_book(symbol), quantity=handle.remaining, price_cap=price_cap)
+            return float(exchange.convert_price_to_precision(symbol, quote['price'])) if quote else None
+        if feed is not None:
+            bid, ask = feed.top_of_book(symbol)
+            price = (ask if handle.side == 'buy' else bid) or feed.last_price(symbol)
+        if not price and pricing is not None:
+            ticker = await pricing.get_ticker(symbol) or {}
+            price = (ticker.get('ask') if handle.side == 'buy' else ticker.get('bid')) or ticker.get('last')
+        if not price:
+            price = await exchange.get_price(symbol)
+        if price and handle.side == 'buy' and price_cap is not None:
+            price = min(price, price_cap)
+        return float(exchange.convert_price_to_precision(symbol, price)) if price else None
+    return reprice
+
+
+# Horodatage des messages Telegram; les lignes de log ont deja le leur
+def now_str():
+    return str(datetime.now()).split('.')[0]
+
+
+class PairSnipe():
+    def __init__(self, manager, symbol, position=None):
+        self.manager = manager
+        self.symbol = symbol
+        self.armed = ArmedPair(symbol, manager.fee_percentage)
+        self.position = position
+        self.state = PairState.HOLDING if position else PairState.WAITING
+        self.task = None
+        self.state_since = time.perf_counter()
+        # Quantite vendue et montant recu, cumules sur les essais d'une vente incomplete
+        self.sold = 0.0
+        self.sold_cost = 0.0
+
+    def describe(self):
+        if self.position:
+            return f"{self.symbol}: {self.state.value} ({self.position['quantity']} à {self.position['buy_price']} USDT)"
+        budget = f" (budget {self.armed.budget:.2f} USDT)" if self.armed.budget is not None else ""
+        return f"{self.symbol}: {self.state.value}{budget}"
+
+    def _set_state(self, state):
+        if state != self.state:
+            logging.info("%s: %s -> %s", self.symbol, self.state.value, state.value,
+                         extra=event('pair_state', symbol=self.symbol, state=state.value, previous=self.state.value))
+            now = time.perf_counter()
+            metrics.observe('pair_state_seconds', now - self.state_since, state=self.state.value)
+            self.state = state
+            self.state_since = now
+
+    async def run(self):
+        manager = self.manager
+        try:
+            if self.position is None and not await self._snipe():
+                return
+            await self._hold()
+        except asyncio.CancelledError:
+            logging.info(f"Paire {self.symbol} retiree a l'etat {self.state.value}.")
+            raise
+        except Exception as e:
+            logging.error(f"Erreur inattendue lors de la transaction pour {self.symbol}: {e}")
+            manager.notify(f"Erreur inattendue lors de la transaction pour {self.symbol}: {e}", priority=TRADE)
+        finally:
+            self._set_state(PairState.DONE)
+            manager.feed.unsubscribe(self.symbol)
+            manager._release(self)
+
+    # WAITING/ARMED: attendre le listing puis acheter au premier prix valide
+    async def _snipe(self):
+        manager = self.manager
+        feed = manager.feed
+        feed.subscribe(self.symbol)
+        while True:
+            await feed.wait_price(self.symbol, timeout=manager.listing_poll_interval)
+            if manager.paused:
+                continue
+
+            current_price = feed.last_price(self.symbol)
+
+            # Tant que le marche n'existe pas, ne recharger les marches que si la surveillance
+            # des listings voit deja le symbole, ou tout de suite si le flux voit des echanges
+            if not self.armed.load_market(manager.exchange.market):
+                if current_price:
+                    await manager.reload_markets(force=True)
+                elif manager.is_listed(self.symbol):
+                    await manager.reload_markets()
+                if not self.armed.load_market(manager.exchange.market):
+                    logging.info("%s n'est pas dans la liste des symboles. Attente que la paire soit listée.", self.symbol,
+                                 extra=event('waiting_listing', sample=self.symbol, symbol=self.symbol))
+                    continue
+            if self.state == PairState.WAITING:
+                self._set_state(PairState.ARMED)
+                manager._allocate(self)
+                logging.info("Marche %s charge, paire armee.", self.symbol, extra=event('armed', symbol=self.symbol))
+                manager.notify(f"Paire {self.symbol} armée, en attente du premier prix.")
+
+            if current_price is None or current_price == 0:
+                logging.info("%s n'est pas disponible ou le prix est zéro. Attente que la paire soit listée.", self.symbol,
+                             extra=event('waiting_price', sample=self.symbol, symbol=self.symbol))
+                continue
+
+            detected_at = feed.updated_at.get(self.symbol, time.perf_counter())
+            # Le budget vient du solde en cache; il n'est lu sur l'API qu'en dernier recours.
+            # Il est fixe avant de reserver l'achat: une venue sans solde ne le prend pas aux autres
+            if self.armed.budget is None:
+                if manager.usdt_balance is None:
+                    manager.usdt_balance = await manager.exchange.get_balance()
+                manager._allocate(self)
+            if not await manager.claim(self, current_price):
+                return False
+            bought = False
+            try:
+                bought = await self._buy(current_price, detected_at)
+            finally:
+                if not bought:
+                    manager.release_claim(self)
+            return bought
+
+    # Ordre limite depasse par le carnet (meilleur ask au-dessus du prix): remplacement sans attendre le timeout
+    async def _watch_book(self, handle):
+        feed = self.manager.feed
+        # Deja au plafond (a la precision du marche): le remplacement ne pourrait pas monter plus haut
+        price_cap = handle.price_cap
+        if price_cap is not None:
+            price_cap = float(self.manager.exchange.convert_price_to_precision(self.symbol, price_cap))
+        while not handle.done():
+            await feed.wait_price(self.symbol, timeout=1)
+            _, ask = feed.top_of_book(self.symbol)
+            at_cap = price_cap is not None and handle.price >= price_cap
+            if ask and ask > handle.price and not handle._reprice and not at_cap:
+                handle.reprice_now()
+
+    async def _buy(self, current_price, detected_at):
+        manager = self.manager
+        self._set_state(PairState.BUYING)
+        logging.info("Tentative de sniping sur %s", self.symbol, extra=event('snipe', symbol=self.symbol, price=current_price))
+
+        try:
+            order = self.armed.build_order(manager.exchange, current_price, manager.feed.order_book(self.symbol), manager.pricer)
+        except ValueError as e:
+            logging.error(str(e))
+            manager.notify(str(e), priority=TRADE)
+            return False
+
+        repricer = book_repricer(self.symbol, manager.exchange, manager.feed, manager.pricing, manager.pricer)
+        handle = await manager.orders.submit(self.symbol, "buy", order['quantity'], order['price'], timeout=manager.order_timeout,
+                                             reprice=repricer, max_replaces=manager.order_max_replaces,
+                                             detected_at=detected_at, params=manager.pricer.order_params(), price_cap=order['price_cap'])
+        # Seule cette tache attend le remplissage; les autres paires et Telegram continuent
+        watcher = asyncio.create_task(self._watch_book(handle)) if manager.pricer.mode == 'limit' and not handle.done() else None
+        try:
+            await handle.wait()
+        finally:
+            if watcher is not None:
+                watcher.cancel()
+        manager.store.record_order(handle)
+        manager.balance_stale.set()
+        if not handle.filled:
+            logging.error(f"Ordre d'achat {self.symbol} non execute ({handle.status}).")
+            manager.notify(f"Ordre d'achat {self.symbol} non execute ({handle.status}).", priority=TRADE)
+            return False
+
+        purchase_price = handle.average or order['price']
+        quantity = handle.filled
+        if manager.usdt_balance is not None:
+            manager.usdt_balance -= purchase_price * quantity
+        logging.info("Buy %s Order success at price: %s USDT!", self.symbol, purchase_price,
+                     extra=event('buy', symbol=self.symbol, price=purchase_price, quantity=quantity, venue=manager.venue))
+        manager.notify(f"{now_str()} |✅ Buy {self.symbol} Order success at price: {purchase_price} USDT!", priority=TRADE)
+
+        manager.store.save_position(self.symbol, purchase_price, quantity, venue=manager.venue)
+        self.position = {'symbol': self.symbol, 'buy_price': purchase_price, 'quantity': quantity, 'venue': manager.venue}
+        self._set_state(PairState.HOLDING)
+
+        logging.info("Waiting for sell...")
+        manager.notify("⌛ Waiting for sell...", priority=TRADE)
+        return True
+
+    # HOLDING: les stops sont evalues par le StopEngine a chaque prix du flux; cette tache ne fait
+    # qu'attendre le declenchement et publier le statut, puis passe a SELLING
+    async def _hold(self):
+        manager = self.manager
+        feed = manager.feed
+        buy_price = self.position['buy_price']
+        quantity = self.position['quantity']
+        feed.subscribe(self.symbol)
+
+        reference = feed.last_price(self.symbol) or await manager.get_price(self.symbol)
+        while reference is None:
+            reference = await feed.wait_price(self.symbol, timeout=manager.listing_poll_interval) or await manager.get_price(self.symbol)
+
+        stop = manager.stops.watch(self.symbol, buy_price, quantity, reference)
+        logging.info(f"Stops initialisés pour {self.symbol}: {stop.describe()}")
+        native_fill = None
+        try:
+            loop = asyncio.get_running_loop()
+            last_status = float('-inf')
+            while not stop.triggered.done():
+                await asyncio.wait([stop.triggered], timeout=1)
+                close_price = stop.last_price
+                # Le statut est journalise au plus une fois par seconde; sur Telegram, il est fusionne
+                # dans le resume periodique du notifier
+                if stop.triggered.done() or loop.time() - last_status < 1:
+                    continue
+                last_status = loop.time()
+                price_change_percent = ((close_price - buy_price) / buy_price) * 100
+                usdt_change = (close_price - buy_price) * quantity
+
+                if price_change_percent >= 0:
+                    variation_message = f"Gain de {price_change_percent:.2f}% ({usdt_change:.2f} USDT)"
+                else:
+                    variation_message = f"Perte de {price_change_percent:.2f}% ({usdt_change:.2f} USDT)"
+
+                logging.info("%s Close: %s ATH: %s Stop: %s | %s", self.symbol, close_price, stop.ath, stop.stop_price, variation_message,
+                             extra=event('status', sample=self.symbol, symbol=self.symbol, price=close_price, ath=stop.ath,
+                                         stop=stop.stop_price, change=price_change_percent))
+                manager.notify(f"📈 {self.symbol} Close: {close_price} ATH: {stop.ath} Stop: {stop.stop_price} | {variation_message}",
+                               priority=STATUS, key=self.symbol)
+            reason, close_price = stop.triggered.result()
+        finally:
+            native_fill = await manager.stops.unwatch(self.symbol)
+
+        logging.info("Close: %s ATH: %s Stop: %s %s Executed", close_price, stop.ath, stop.stop_price, reason,
+                     extra=event('stop', symbol=self.symbol, price=close_price, reason=reason))
+        # Vente incomplete: la position est gardee avec la quantite restante et la vente relancee au prix courant
+        while not await self._sell(close_price, reason, native_fill):
+            native_fill = None
+            await asyncio.sleep(manager.listing_poll_interval)
+            close_price = feed.last_price(self.symbol) or await manager.get_price(self.symbol) or close_price
+
+    # native_fill: ordre stop natif deja execute cote echange; seul le reste est vendu ici.
+    # Renvoie False si une partie reste a vendre: la position est alors enregistree avec la quantite
+    # restante, et la position n'est effacee et le profit publie qu'une fois tout vendu
+    async def _sell(self, close_price, reason='trailing_stop', native_fill=None):
+        manager = self.manager
+        exchange = manager.exchange
+        buy_price = self.position['buy_price']
+        quantity = self.position['quantity']
+        self._set_state(PairState.SELLING)
+
+        native_filled = float(native_fill['filled']) if native_fill else 0.0
+        native_cost = native_filled * (native_fill.get('average') or native_fill.get('price') or close_price) if native_fill else 0.0
+        remaining = float(exchange.convert_amount_to_precision(self.symbol, quantity - native_filled)) if quantity > native_filled else 0.0
+        sold, cost = native_filled, native_cost
+        unsold = 0.0
+        if remaining:
+            # La vente est remplacee au meilleur prix tant qu'elle n'est pas entierement executee
+            handle = await manager.orders.submit(self.symbol, 'sell', remaining, close_price, timeout=manager.order_timeout,
+                                                 reprice=book_repricer(self.symbol, exchange, manager.feed, manager.pricing), max_replaces=None)
+            await handle.wait()
+            manager.store.record_order(handle)
+            sold += handle.filled
+            cost += handle.filled * (handle.average or close_price)
+            if handle.remaining and not exchange.dry_run:
+                unsold = float(exchange.convert_amount_to_precision(self.symbol, quantity - sold)) if quantity > sold else 0.0
+        manager.balance_stale.set()
+        self.sold += sold
+        self.sold_cost += cost
+
+        if unsold:
+            self.position = dict(self.position, quantity=unsold)
+            manager.store.save_position(self.symbol, buy_price, unsold, venue=manager.venue)
+            logging.error(f"Vente {self.symbol} incomplete: {sold}/{quantity} executes, {unsold} restent en position.")
+            manager.notify(f"Vente {self.symbol} incomplete: {sold}/{quantity} executes, {unsold} restent en position. Nouvel essai...",
+                           priority=TRADE)
+            return False
+
+        sold, cost = self.sold, self.sold_cost
+        sell_price = cost / sold if sold else close_price
+        profit_percentage = ((sell_price - buy_price) / buy_price) * 100 if buy_price else 0
+        profit_usdt = cost - buy_price * sold
+        logging.info("Sell %s (%s) Order success at price: %s USDT! Profit: %.2f%% (%.2f USDT)", self.symbol, reason, sell_price,
+                     profit_percentage, profit_usdt, extra=event('sell', symbol=self.symbol, price=sell_price, reason=reason,
+                                                                 profit=profit_usdt, venue=manager.venue))
+        manager.notify(f"{now_str()} |✅ 💯 Sell {self.symbol} ({reason}) Order success at price: {sell_price} USDT! Profit: {profit_percentage:.2f}% ({profit_usdt:.2f} USDT)", priority=TRADE, key=self.symbol)
+
+        manager.store.clear_position(self.symbol)
+        manager.store.add_traded_pair(self.symbol)
+        return True
+
+
+# venue: nom de l'echange, enregistre avec les positions; router: VenuePool qui attribue
+# l'achat d'une paire suivie sur plusieurs echanges
+class PairManager():
+    def __init__(self, exchange, feed, orders, store, notify, config, pricing=None, listings=None, venue=None):
+        self.exchange = exchange
+        self.venue = venue
+        self.router = None
+        self.pricing = pricing
+        self.listings = listings
+        self.feed = feed
+        self.orders = orders
+        self.store = store
+        self.notify = notify
+        self.usdt_amount = config['usdt_amount']
+        self.fee_percentage = config.get('fee_percentage', 0.001)
+        self.listing_poll_interval = config.get('listing_poll_interval', 1)
+        self.market_refresh_interval = config.get('market_refresh_interval', 10)
+        self.order_timeout = config.get('order_timeout', 10)
+        self.order_max_replaces = config.get('order_max_replaces', 3)
+        self.pricer = EntryPricer(config.get('entry_max_slippage', 0.05), config.get('entry_mode', 'limit'))
+        rule = StopRule(config.get('stop_trailing_percent', 0.01), config.get('take_profit_percent'), config.get('stop_loss_percent'))
+        self.stops = StopEngine(feed, exchange, rule, native=config.get('native_stops', False))
+        self.snipes = {}
+        self.paused = False
+        self.usdt_balance = None
+        self.balance_stale = asyncio.Event()
+        self._market_lock = asyncio.Lock()
+        # Horloge de la boucle asyncio (et non l'heure murale): le simulateur de backtest la controle
+        self._last_market_reload = float('-inf')
+
+    # Prix ponctuel hors flux: groupe avec les autres paires quand un PricingService est disponible
+    async def get_price(self, symbol):
+        if self.pricing is not None:
+            return await self.pricing.get_price(symbol)
+        return await self.exchange.get_price(symbol)
+
+    def _start(self, snipe):
+        self.snipes[snipe.symbol] = snipe
+        snipe.task = asyncio.create_task(snipe.run())
+        return snipe
+
+    # Reprendre le suivi des positions ouvertes sauvegardees sur cette venue; la venue principale
+    # reprend aussi les positions enregistrees sans venue
+    def restore(self, primary=True):
+        for position in self.store.positions.values():
+            if position.get('venue') != self.venue and not (primary and not position.get('venue')):
+                continue
+            logging.info(f"Reprise de la position ouverte: {position['symbol']} à {position['buy_price']} USDT pour {position['quantity']} unités.")
+            self._start(PairSnipe(self, position['symbol'], position=dict(position)))
+
+    # Sans surveillance des listings, tout symbole est considere comme potentiellement liste
+    def is_listed(self, symbol):
+        return self.listings is None or self.listings.is_listed(symbol)
+
+    # Nouveau listing: reveiller la paire suivie correspondante, ou l'armer si elle correspond
+    # a un motif d'armement automatique
+    def on_listing(self, symbol):
+        key = normalize_symbol(symbol)
+        snipe = next((snipe for snipe in self.snipes.values() if normalize_symbol(snipe.symbol) == key), None)
+        if snipe is not None:
+            if snipe.state == PairState.WAITING:
+                asyncio.create_task(self._wake_listed(snipe))
+        elif self.listings is not None and self.listings.matches_auto_arm(symbol):
+            self.add(symbol, source="armement automatique")
+
+    # Marches recharges seulement si la surveillance des listings ne les a pas deja fournis
+    async def _wake_listed(self, snipe):
+        if snipe.symbol not in (self.exchange.market or {}):
+            await self.reload_markets(force=True)
+        self.feed.wake(snipe.symbol)
+
+    def add(self, symbol, source="Telegram"):
+        if symbol in self.snipes:
+            logging.debug(f"La paire {symbol} est déjà suivie.")
+            return False
+        if self.store.is_traded(symbol):
+            logging.info(f"La paire {symbol} a déjà été tradée. Ignorer cette paire.")
+            return False
+        self._start(PairSnipe(self, symbol))
+        logging.info(f"Paire {symbol} ajoutée via {source}.")
+        self.notify(f"Paire {symbol} ajoutée via {source}.")
+        return True
+
+    def remove(self, symbol):
+        snipe = self.snipes.get(symbol)
+        if snipe is None:
+            self.notify(f"La paire {symbol} n'est pas suivie.")
+            return False
+        if snipe.state in ACTIVE_STATES:
+            logging.info(f"Impossible de retirer {symbol}, un trade est en cours.")
+            self.notify(f"Impossible de retirer {symbol}, un trade est en cours.")
+            return False
+        snipe.task.cancel()
+        self.snipes.pop(symbol, None)
+        logging.info(f"Paire {symbol} retirée via Telegram.")
+        self.notify(f"Paire {symbol} retirée via Telegram.")
+        return True
+
+    # Juste avant l'achat: sans routeur, l'achat revient toujours a cette venue
+    async def claim(self, snipe, price):
+        if self.router is None:
+            return True
+        return await self.router.claim(snipe, price)
+
+    # Achat reserve mais non execute: le routeur rend la paire aux autres venues
+    def release_claim(self, snipe):
+        if self.router is not None:
+            self.router.release(snipe)
+
+    # Paire retiree sans notification (ex: achat attribue a une autre venue)
+    def withdraw(self, symbol, reason):
+        snipe = self.snipes.get(symbol)
+        if snipe is None or snipe.state in ACTIVE_STATES:
+            return False
+        snipe.task.cancel()
+        del self.snipes[symbol]
+        logging.info(f"Paire {symbol} retiree de {self.venue}: {reason}.")
+        return True
+
+    # /change_paire: la nouvelle paire remplace celles qui attendent encore leur listing
+    def replace(self, symbol):
+        for other in list(self.snipes.values()):
+            if other.symbol != symbol and other.state not in ACTIVE_STATES:
+                self.remove(other.symbol)
+        return self.add(symbol)
+
+    def status(self):
+        if not self.snipes:
+            return "Aucune paire suivie."
+        return "\n".join(snipe.describe() for snipe in self.snipes.values())
+
+    # Un seul rechargement des marches a la fois, espace de market_refresh_interval sauf urgence
+    async def reload_markets(self, force=False):
+        async with self._market_lock:
+            now = asyncio.get_running_loop().time()
+            if now - self._last_market_reload < (1 if force else self.market_refresh_interval):
+                return
+            self._last_market_reload = now
+            await self.exchange.reload_markets()
+
+    def update_balance(self, usdt_balance):
+        self.usdt_balance = usdt_balance
+        for snipe in self.snipes.values():
+            if snipe.state == PairState.ARMED:
+                snipe.armed.budget = None
+        for snipe in self.snipes.values():
+            if snipe.state == PairState.ARMED:
+                self._allocate(snipe)
+
+    # Budget d'une paire: usdt_amount, dans la limite du solde non reserve par les autres paires
+    def _allocate(self, snipe):
+        if self.usdt_balance is None:
+            return
+        reserved = sum(other.armed.budget or 0 for other in self.snipes.values()
+                       if other is not snipe and other.state in (PairState.ARMED, PairState.BUYING))
+        available = max(self.usdt_balance - reserved, 0)
+        if self.usdt_amount > available:
+            budget = available * 0.95
+            if budget != snipe.armed.budget:
+                logging.warning(f"Le montant d'achat ({self.usdt_amount} USDT) est superieur au solde disponible ({available} USDT) pour {snipe.symbol}. Ajustement du montant d'achat.")
+        else:
+            budget = self.usdt_amount
+        snipe.armed.budget = budget
+
+    def _release(self, snipe):
+        if self.snipes.get(snipe.symbol) is snipe:
+            del self.snipes[snipe.symbol]
@@ -0,0 +1,183 @@
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+# Journal des positions: chaque evenement (ouverture, fermeture, ordre, paire tradee) est ajoute
+# a une base SQLite en mode WAL, dans la meme transaction que la mise a jour des tables d'etat
+# (positions ouvertes, paires tradees). Un arret brutal laisse donc un etat coherent, relu en une
+# requete au demarrage; replay() reconstruit cet etat a partir des seuls evenements.
+# L'etat en memoire est mis a jour tout de suite; l'ecriture durable est faite par un thread dedie.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ts REAL NOT NULL,
+    kind TEXT NOT NULL,
+    symbol TEXT,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS positions (
+    symbol TEXT PRIMARY KEY,
+    buy_price REAL NOT NULL,
+    quantity REAL NOT NULL,
+    opened_at REAL NOT NULL,
+    venue TEXT
+);
+CREATE TABLE IF NOT EXISTS traded_pairs (
+    symbol TEXT PRIMARY KEY,
+    traded_at REAL NOT NULL
+);
+"""
+
+
+class PositionStore():
+    def __init__(self, journal_file='journal.db', open_position_file='open_position.json', traded_pairs_file='traded_pairs.json'):
+        self.journal_file = journal_file
+        self._lock = threading.Lock()
+        self._db = self._connect()
+        self.positions = self._load_positions()
+        self.traded_pairs = self._load_traded_pairs()
+        if not self.positions and not self.traded_pairs:
+            self._import_json(open_position_file, traded_pairs_file)
+        self._queue = queue.Queue()
+        self._writer = threading.Thread(target=self._write_loop, name='journal', daemon=True)
+        self._writer.start()
+
+    def _connect(self):
+        db = sqlite3.connect(self.journal_file, check_same_thread=False, isolation_level=None)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=FULL")
+        db.executescript(SCHEMA)
+        # Journaux anterieurs au multi-echange: la venue des positions est ajoutee (vide = echange principal)
+        if 'venue' not in [row[1] for row in db.execute("PRAGMA table_info(positions)")]:
+            db.execute("ALTER TABLE positions ADD COLUMN venue TEXT")
+        return db
+
+    def _load_positions(self):
+        with self._lock:
+            rows = self._db.execute("SELECT symbol, buy_price, quantity, venue FROM positions").fetchall()
+        return {symbol: {'symbol': symbol, 'buy_price': buy_price, 'quantity': quantity, 'venue': venue}
+                for symbol, buy_price, quantity, venue in rows}
+
+    def _load_traded_pairs(self):
+        with self._lock:
+            return [symbol for (symbol,) in self._db.execute("SELECT symbol FROM traded_pairs ORDER BY traded_at")]
+
+    # Reprise des anciens fichiers JSON au premier demarrage avec le journal
+    def _import_json(self, open_position_file, traded_pairs_file):
+        positions = {}
+        if os.path.exists(open_position_file) and os.path.getsize(open_position_file) > 0:
+            with open(open_position_file, 'r') as f:
+                positions = json.load(f)
+            if 'symbol' in positions:
+                positions = {positions['symbol']: positions}
+        traded_pairs = []
+        if os.path.exists(traded_pairs_file) and os.path.getsize(traded_pairs_file) > 0:
+            with open(traded_pairs_file, 'r') as f:
+                traded_pairs = json.load(f)
+        if not positions and not traded_pairs:
+            return
+        for position in positions.values():
+            self._apply('position_open', position['symbol'], position)
+        for symbol in traded_pairs:
+            self._apply('traded', symbol, {})
+        self.positions = self._load_positions()
+        self.traded_pairs = self._load_traded_pairs()
+        logging.info(f"Anciens fichiers {open_position_file} et {traded_pairs_file} importes dans {self.journal_file}.")
+
+    # Un evenement et son effet sur les tables d'etat, dans une seule transaction
+    def _apply(self, kind, symbol, data, ts=None):
+        ts = ts or time.time()
+        with self._transaction():
+            self._db.execute("INSERT INTO events (ts, kind, symbol, data) VALUES (?, ?, ?, ?)", (ts, kind, symbol, json.dumps(data)))
+            self._apply_state(kind, symbol, data, ts)
+
+    def _apply_state(self, kind, symbol, data, ts):
+        if kind == 'position_open':
+            self._db.execute("INSERT OR REPLACE INTO positions (symbol, buy_price, quantity, opened_at, venue) VALUES (?, ?, ?, ?, ?)",
+                             (symbol, data['buy_price'], data['quantity'], ts, data.get('venue')))
+        elif kind == 'position_close':
+            self._db.execute("DELETE FROM positions WHERE symbol = ?", (symbol,))
+        elif kind == 'traded':
+            self._db.execute("INSERT OR IGNORE INTO traded_pairs (symbol, traded_at) VALUES (?, ?)", (symbol, ts))
+
+    # La connexion est partagee entre la boucle principale et le thread d'ecriture
+    @contextmanager
+    def _transaction(self):
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                yield
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+
+    def _write_loop(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                self._apply(*item)
+            except Exception as e:
+                logging.error(f"Erreur lors de l'ecriture du journal {self.journal_file}: {e}")
+            finally:
+                self._queue.task_done()
+
+    def _record(self, kind, symbol, data):
+        self._queue.put((kind, symbol, data, time.time()))
+
+    # Reconstruire les tables d'etat a partir des evenements (ex: apres une modification manuelle)
+    def replay(self):
+        self.flush()
+        with self._lock:
+            events = self._db.execute("SELECT kind, symbol, data, ts FROM events ORDER BY id").fetchall()
+        with self._transaction():
+            self._db.execute("DELETE FROM positions")
+            self._db.execute("DELETE FROM traded_pairs")
+            for kind, symbol, data, ts in events:
+                self._apply_state(kind, symbol, json.loads(data), ts)
+        self.positions = self._load_positions()
+        self.traded_pairs = self._load_traded_pairs()
+        logging.info(f"{len(events)} evenements rejoues depuis {self.journal_file}.")
+
+    # Attendre que tous les evenements en file soient ecrits
+    def flush(self):
+        self._queue.join()
+
+    def close(self):
+        self._queue.put(None)
+        self._writer.join()
+        self._db.close()
+
+    def save_position(self, symbol, buy_price, quantity, venue=None):
+        self.positions[symbol] = {'symbol': symbol, 'buy_price': buy_price, 'quantity': quantity, 'venue': venue}
+        self._record('position_open', symbol, self.positions[symbol])
+        logging.info(f"Position ouverte sauvegardee: {symbol} à {buy_price} USDT pour {quantity} unites{f' sur {venue}' if venue else ''}.")
+
+    def clear_position(self, symbol):
+        self.positions.pop(symbol, None)
+        self._record('position_close', symbol, {})
+        logging.info(f"Position ouverte {symbol} efface.")
+
+    # Historique complet des ordres: chaque ordre suivi (remplacements compris) et son execution
+    def record_order(self, handle):
+        self._record('order', handle.symbol, {
+            'side': handle.side, 'order_ids': handle.order_ids, 'status': handle.status, 'amount': handle.amount,
+            'filled': handle.filled, 'average': handle.average, 'replaces': handle.replaces,
+        })
+
+    def is_traded(self, symbol):
+        return symbol in self.traded_pairs
+
+    def add_traded_pair(self, symbol):
+        if symbol not in self.traded_pairs:
+            self.traded_pairs.append(symbol)
+        self._record('traded', symbol, {})
+        logging.info(f"Paire {symbol} ajoutee aux paires tradees dans {self.journal_file}")
@@ -0,0 +1,71 @@
+import asyncio
+import logging
+import time
+
+from metrics import metrics
+
+# Service de prix groupes au-dessus de SpotExchange: toutes les demandes de tickers
+# recues pendant une courte fenetre sont regroupees en un seul fetch_tickers, et chaque
+# ticker recu est diffuse aux abonnes. Un ticker encore frais est servi sans requete.
+
+
+class PricingService():
+    def __init__(self, exchange, coalesce_window=0.05, max_age=0.5):
+        self.exchange = exchange
+        self.coalesce_window = coalesce_window
+        self.max_age = max_age
+        self.tickers = {}
+        self.fetched_at = {}
+        self.batches = 0
+        self._listeners = []
+        self._wanted = set()
+        self._pending = None
+
+    # callback(symbol, ticker) est appele pour chaque ticker recu
+    def add_listener(self, callback):
+        self._listeners.append(callback)
+
+    def _fresh(self, symbol):
+        return time.perf_counter() - self.fetched_at.get(symbol, float('-inf')) <= self.max_age
+
+    # Rafraichir les tickers demandes; les appels simultanes partagent la meme requete
+    async def refresh(self, symbols):
+        markets = self.exchange.market or {}
+        symbols = [symbol for symbol in symbols if symbol in markets]
+        stale = [symbol for symbol in symbols if not self._fresh(symbol)]
+        if stale:
+            self._wanted.update(stale)
+            if self._pending is None:
+                self._pending = asyncio.get_running_loop().create_future()
+                asyncio.create_task(self._flush())
+            await asyncio.shield(self._pending)
+        return {symbol: self.tickers[symbol] for symbol in symbols if symbol in self.tickers}
+
+    async def _flush(self):
+        await asyncio.sleep(self.coalesce_window)
+        future, self._pending = self._pending, None
+        wanted, self._wanted = sorted(self._wanted), set()
+        try:
+            with metrics.timer('loop_phase_seconds', phase='pricing_batch'):
+                tickers = await self.exchange.get_tickers(wanted)
+            self.batches += 1
+            now = time.perf_counter()
+            for symbol in wanted:
+                ticker = tickers.get(symbol)
+                if ticker is None:
+                    continue
+                self.tickers[symbol] = ticker
+                self.fetched_at[symbol] = now
+                for callback in self._listeners:
+                    callback(symbol, ticker)
+        except Exception as e:
+            logging.error(f"Erreur lors de la recuperation groupee des prix: {e}")
+        finally:
+            future.set_result(None)
+
+    async def get_ticker(self, symbol):
+        return (await self.refresh([symbol])).get(symbol)
+
+    async def get_price(self, symbol):
+        ticker = await self.get_ticker(symbol)
+        return ticker.get('last') if ticker else None
@@ -0,0 +1,195 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import random
+import time
+from collections import Counter, deque
+
+# Ordonnanceur central des requetes REST: un seau a jetons par echange, alimente au rythme
+# publie par l'echange, et chaque requete consomme le poids de son endpoint. Les requetes
+# attendent dans une file a priorites: les ordres et annulations passent avant les tickers,
+# qui passent avant les rechargements de marches. Un 429 bloque le seau avec un recul aleatoire.
+
+PRIORITY_ORDER = 0       # creation et annulation d'ordres
+PRIORITY_ACCOUNT = 1     # etat des ordres, solde, listenKey
+PRIORITY_MARKET = 2      # tickers, carnets, transactions
+PRIORITY_BACKGROUND = 3  # listes de symboles et rechargements de marches
+
+
+# Priorite d'une requete d'apres sa methode et son chemin
+def request_priority(method, path):
+    path = path.lower()
+    if method in ('POST', 'DELETE') and 'order' in path:
+        return PRIORITY_ORDER
+    if 'order' in path or 'account' in path or 'balance' in path or 'userdatastream' in path:
+        return PRIORITY_ACCOUNT
+    if 'symbols' in path or 'coin/list' in path or 'exchangeinfo' in path:
+        return PRIORITY_BACKGROUND
+    return PRIORITY_MARKET
+
+
+# Recul exponentiel avec gigue: la moitie du delai est fixe, l'autre aleatoire
+def backoff_delay(attempt, base=0.5, maximum=10):
+    delay = min(maximum, base * 2 ** attempt)
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+class TokenBucket():
+    def __init__(self, capacity, rate, window=60):
+        self.capacity = capacity
+        self.rate = rate
+        self.window = window
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0
+        self.used = 0
+        self.throttled = 0
+        self._history = deque()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return now
+
+    # Attente necessaire avant de pouvoir consommer ce poids (0 si possible tout de suite)
+    def delay(self, weight):
+        now = self._refill()
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        needed = min(weight, self.capacity)
+        if self.tokens >= needed:
+            return 0
+        return (needed - self.tokens) / self.rate
+
+    def available(self):
+        now = self._refill()
+        return max(self.tokens, 0) if now >= self.blocked_until else 0
+
+    def consume(self, weight):
+        now = self._refill()
+        self.tokens -= weight
+        self.used += weight
+        self._history.append((now, weight))
+
+    # Apres un 429: plus aucun jeton avant la fin du recul
+    def penalize(self, seconds):
+        now = self._refill()
+        self.tokens = 0
+        self.blocked_until = max(self.blocked_until, now + seconds)
+
+    # Poids consomme sur la fenetre glissante, a comparer au poids disponible sur la meme fenetre
+    def used_in_window(self):
+        limit = time.monotonic() - self.window
+        while self._history and self._history[0][0] < limit:
+            self._history.popleft()
+        return sum(weight for _, weight in self._history)
+
+
+class RequestScheduler():
+    def __init__(self, max_retries=3, backoff_base=0.5, backoff_max=10, default_capacity=20, default_rate=20):
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.default_capacity = default_capacity
+        self.default_rate = default_rate
+        self.buckets = {}
+        self.weight_by_endpoint = Counter()
+        self.retries = Counter()
+        self._queues = {}
+        self._events = {}
+        self._seq = itertools.count()
+
+    # Limite d'un echange: capacity jetons au plus, rate jetons regeneres par seconde
+    def configure(self, name, capacity, rate):
+        bucket = self.bucket(name)
+        bucket.capacity = capacity
+        bucket.rate = rate
+        bucket.tokens = min(bucket.tokens, capacity)
+
+    def bucket(self, name):
+        bucket = self.buckets.get(name)
+        if bucket is None:
+            bucket = self.buckets[name] = TokenBucket(self.default_capacity, self.default_rate)
+        return bucket
+
+    def _notify(self, name):
+        event = self._events.pop(name, None)
+        if event is not None:
+            event.set()
+
+    async def _wait_change(self, name, timeout):
+        event = self._events.setdefault(name, asyncio.Event())
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    # Attendre son tour: seule la requete la plus prioritaire (puis la plus ancienne) consomme des jetons
+    async def acquire(self, name, weight=1, priority=PRIORITY_MARKET, endpoint=None):
+        bucket = self.bucket(name)
+        queue = self._queues.setdefault(name, [])
+        entry = (priority, next(self._seq))
+        heapq.heappush(queue, entry)
+        self._notify(name)
+        waited = False
+        try:
+            while True:
+                delay = None
+                if queue[0] == entry:
+                    delay = bucket.delay(weight)
+                    if delay <= 0:
+                        bucket.consume(weight)
+                        self.weight_by_endpoint[f"{name} {endpoint}"] += weight
+                        if waited:
+                            bucket.throttled += 1
+                        return
+                waited = True
+                await self._wait_change(name, delay)
+        finally:
+            queue.remove(entry)
+            heapq.heapify(queue)
+            self._notify(name)
+
+    # Bloquer l'echange apres un 429 et renvoyer le delai applique
+    def backoff(self, name, attempt=0):
+        delay = backoff_delay(attempt, self.backoff_base, self.backoff_max)
+        self.bucket(name).penalize(delay)
+        self.retries[name] += 1
+        return delay
+
+    # Executer une requete a son tour; les refus pour limite de debit sont retentes avec recul
+    async def run(self, name, weight, priority, call, endpoint=None, retry_on=()):
+        attempt = 0
+        while True:
+            await self.acquire(name, weight, priority, endpoint)
+            try:
+                return await call()
+            except retry_on as e:
+                if attempt >= self.max_retries:
+                    raise
+                delay = self.backoff(name, attempt)
+                attempt += 1
+                logging.warning(f"Limite de requetes atteinte sur {name} ({endpoint}): {e}. Nouvel essai dans {delay:.2f}s.")
+
+    def metrics(self):
+        return {
+            name: {
+                'capacity': bucket.capacity,
+                'available': round(bucket.available(), 2),
+                'used_window': bucket.used_in_window(),
+                'available_window': bucket.rate * bucket.window,
+                'used_total': bucket.used,
+                'throttled': bucket.throttled,
+                'retries': self.retries[name],
+                'waiting': len(self._queues.get(name, [])),
+            }
+            for name, bucket in self.buckets.items()
+        }
+
+    def summary(self):
+        return ", ".join(
+            f"{name}: {m['used_window']}/{m['available_window']:.0f} de poids sur {self.buckets[name].window}s, "
+            f"{m['throttled']} requetes retardees, {m['retries']} nouveaux essais"
+            for name, m in self.metrics().items())
@@ -0,0 +1,182 @@
+import asyncio
+import glob
+import logging
+import os
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+from listing_watch import normalize_symbol
+from metrics import metrics
+
+# Enregistrement des donnees de marche des paires suivies: transactions, carnets (20 niveaux)
+# et evenements d'ordres, en tableaux structures numpy. Le chemin critique ne fait qu'ajouter un
+# tuple a un tampon; une tache de fond convertit les tampons en tableaux et les ajoute, hors de la
+# boucle asyncio, a des fichiers binaires bruts decoupes par periode (chunk_seconds):
+#   <directory>/<SYMBOLE>/<type>-<AAAAMMJJTHHMM>.bin
+# Les enregistrements ont une taille fixe: un fichier se relit directement en memoire partagee
+# avec np.memmap(fichier, dtype=DTYPES[type], mode='r'), sans copie ni en-tete.
+
+DEPTH = 20
+
+TICK_DTYPE = np.dtype([
+    ('t', '<f8'),           # horodatage, secondes depuis l'epoque
+    ('price', '<f8'),
+    ('volume', '<f8'),      # NaN pour un prix REST (pas de transaction)
+    ('side', 'i1'),         # 1 achat, 2 vente (cote MEXC), 0 inconnu
+])
+
+BOOK_DTYPE = np.dtype([
+    ('t', '<f8'),
+    ('bid_price', '<f8', (DEPTH,)),    # niveaux absents: NaN
+    ('bid_volume', '<f8', (DEPTH,)),
+    ('ask_price', '<f8', (DEPTH,)),
+    ('ask_volume', '<f8', (DEPTH,)),
+])
+
+ORDER_DTYPE = np.dtype([
+    ('t', '<f8'),
+    ('order_id', 'S32'),
+    ('side', 'S4'),
+    ('status', 'S10'),
+    ('price', '<f8'),
+    ('amount', '<f8'),
+    ('filled', '<f8'),
+    ('average', '<f8'),
+])
+
+DTYPES = {'ticks': TICK_DTYPE, 'books': BOOK_DTYPE, 'orders': ORDER_DTYPE}
+
+
+def _levels(levels):
+    prices = np.full(DEPTH, np.nan)
+    volumes = np.full(DEPTH, np.nan)
+    levels = levels[:DEPTH]
+    if levels:
+        array = np.asarray(levels, dtype=float).reshape(-1, 2)
+        prices[:len(array)] = array[:, 0]
+        volumes[:len(array)] = array[:, 1]
+    return prices, volumes
+
+
+# Horodatage en secondes: les messages MEXC sont en millisecondes
+def _seconds(timestamp):
+    if timestamp is None:
+        return time.time()
+    return timestamp / 1000 if timestamp > 1e11 else float(timestamp)
+
+
+class MarketRecorder():
+    def __init__(self, directory='records', chunk_seconds=3600, flush_interval=5):
+        self.directory = directory
+        self.chunk_seconds = chunk_seconds
+        self.flush_interval = flush_interval
+        self.rows = 0
+        self._buffers = {}
+
+    def _append(self, symbol, kind, row):
+        self._buffers.setdefault((normalize_symbol(symbol), kind), []).append(row)
+
+    def record_tick(self, symbol, price, volume=None, side=0, timestamp=None):
+        self._append(symbol, 'ticks', (_seconds(timestamp), price, np.nan if volume is None else volume, side or 0))
+
+    def record_book(self, symbol, book, timestamp=None):
+        bid_prices, bid_volumes = _levels(book.get('bids') or [])
+        ask_prices, ask_volumes = _levels(book.get('asks') or [])
+        self._append(symbol, 'books', (_seconds(timestamp), bid_prices, bid_volumes, ask_prices, ask_volumes))
+
+    # A brancher sur OrderHandle.add_listener: une ligne a chaque changement de l'ordre
+    def record_order(self, handle):
+        self._append(handle.symbol, 'orders', (
+            time.time(), (handle.order_id or '').encode(), handle.side.encode(), handle.status.encode(),
+            handle.price or np.nan, handle.amount, handle.filled, handle.average or np.nan))
+
+    def _chunk_path(self, symbol, kind, t):
+        start = int(t // self.chunk_seconds * self.chunk_seconds)
+        stamp = datetime.fromtimestamp(start, timezone.utc).strftime('%Y%m%dT%H%M')
+        return os.path.join(self.directory, symbol, f"{kind}-{stamp}.bin")
+
+    # Conversion et ecriture des tampons, appelee hors de la boucle asyncio
+    def _write(self, buffers):
+        for (symbol, kind), rows in buffers.items():
+            array = np.array(rows, dtype=DTYPES[kind])
+            chunks = (array['t'] // self.chunk_seconds).astype(np.int64)
+            for chunk in np.unique(chunks):
+                part = array[chunks == chunk]
+                path = self._chunk_path(symbol, kind, part['t'][0])
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, 'ab') as f:
+                    f.write(part.tobytes())
+            metrics.increment('recorder_rows_total', len(array), kind=kind)
+            self.rows += len(array)
+
+    async def flush(self):
+        if not self._buffers:
+            return
+        buffers, self._buffers = self._buffers, {}
+        await asyncio.get_running_loop().run_in_executor(None, self._write, buffers)
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                with metrics.timer('loop_phase_seconds', phase='recorder_flush'):
+                    await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"Erreur lors de l'ecriture des donnees de marche dans {self.directory}: {e}")
+
+    async def close(self):
+        await self.flush()
+        logging.info(f"{self.rows} lignes de donnees de marche enregistrees dans {self.directory}.")
+
+
+# Fichiers d'un symbole et d'un type, dans l'ordre chronologique
+def chunk_files(directory, symbol, kind):
+    return sorted(glob.glob(os.path.join(directory, normalize_symbol(symbol), f"{kind}-*.bin")))
+
+
+# Chaque fichier projete en memoire (lecture seule), sans copie
+def open_chunks(directory, symbol, kind):
+    return [np.memmap(path, dtype=DTYPES[kind], mode='r') for path in chunk_files(directory, symbol, kind) if os.path.getsize(path)]
+
+
+# Tableau unique d'un symbole, eventuellement restreint a [start, end) en secondes
+def load(directory, symbol, kind, start=None, end=None):
+    chunks = open_chunks(directory, symbol, kind)
+    if not chunks:
+        return np.empty(0, dtype=DTYPES[kind])
+    array = np.concatenate(chunks)
+    mask = np.ones(len(array), dtype=bool)
+    if start is not None:
+        mask &= array['t'] >= start
+    if end is not None:
+        mask &= array['t'] < end
+    return array[mask]
+
+
+def recorded_symbols(directory):
+    return sorted(name for name in os.listdir(directory) if os.path.isdir(os.path.join(directory, name)))
+
+
+# Reconstituer les messages MEXC (deals et depth) d'un enregistrement, tries par horodatage,
+# pour replay_server.py et backtest.py
+def to_messages(directory, symbols=None):
+    messages = []
+    for market_id in [normalize_symbol(symbol) for symbol in symbols] if symbols else recorded_symbols(directory):
+        for tick in load(directory, market_id, 'ticks'):
+            deal = {'p': repr(float(tick['price'])), 'v': repr(0.0 if np.isnan(tick['volume']) else float(tick['volume'])),
+                    'S': int(tick['side']), 't': int(round(tick['t'] * 1000))}
+            messages.append({'c': f"spot@public.deals.v3.api@{market_id}", 's': market_id, 't': deal['t'], 'd': {'deals': [deal]}})
+        for book in load(directory, market_id, 'books'):
+            data = {}
+            for side in ('bid', 'ask'):
+                prices, volumes = book[f'{side}_price'], book[f'{side}_volume']
+                valid = ~np.isnan(prices)
+                data[f'{side}s'] = [{'p': repr(float(price)), 'v': repr(float(volume))} for price, volume in zip(prices[valid], volumes[valid])]
+            messages.append({'c': f"spot@public.limit.depth.v3.api@{market_id}@{DEPTH}", 's': market_id,
+                             't': int(round(book['t'] * 1000)), 'd': data})
+    messages.sort(key=lambda message: message['t'])
+    return messages
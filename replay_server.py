@@ -0,0 +1,133 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+
+from aiohttp import web
+
+from recorder import to_messages
+
+# Serveur WebSocket local qui remplace MEXC pour les tests: il accepte les messages
+# SUBSCRIPTION/UNSUBSCRIPTION/PING du protocole MEXC et rejoue des messages enregistres
+# (un message brut MEXC par ligne JSON, ou une archive de recorder.py) en respectant leurs horodatages "t".
+
+
+# Un repertoire est une archive de recorder.py, reconvertie en messages MEXC
+def load_messages(file_path):
+    if os.path.isdir(file_path):
+        return to_messages(file_path)
+    with open(file_path, 'r') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+class ReplayServer():
+    def __init__(self, messages=(), speed=1.0, host='127.0.0.1', port=0, loop_replay=False):
+        self.messages = list(messages)
+        self.speed = speed
+        self.host = host
+        self.port = port
+        self.loop_replay = loop_replay
+        self.url = None
+        self._runner = None
+        self._clients = {}
+
+    async def start(self):
+        app = web.Application()
+        self._add_routes(app)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        host, port = self._runner.addresses[0][:2]
+        self.url = f'ws://{host}:{port}/ws'
+        logging.info(f"Serveur de rejeu demarre sur {self.url}")
+        return self.url
+
+    # Point d'extension pour les serveurs simules qui ajoutent des routes REST
+    def _add_routes(self, app):
+        app.router.add_get('/ws', self._handle_ws)
+
+    async def stop(self):
+        await self.drop_connections()
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    # Envoyer un message a tous les clients abonnes a son canal
+    async def publish(self, message):
+        for ws, channels in list(self._clients.items()):
+            if message.get('c') in channels and not ws.closed:
+                await ws.send_json(message)
+
+    # Fermer toutes les sockets, pour simuler une coupure cote echange
+    async def drop_connections(self):
+        for ws in list(self._clients):
+            await ws.close()
+        self._clients.clear()
+
+    async def _replay(self):
+        while True:
+            previous = None
+            for message in self.messages:
+                timestamp = message.get('t')
+                if self.speed and previous is not None and timestamp is not None:
+                    await asyncio.sleep(max(0, timestamp - previous) / 1000 / self.speed)
+                previous = timestamp if timestamp is not None else previous
+                await self.publish(message)
+            if not self.loop_replay:
+                return
+
+    async def _handle_ws(self, request):
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        channels = self._clients[ws] = set()
+        replay_task = None
+        try:
+            async for msg in ws:
+                if ws.closed:
+                    break
+                if msg.type != web.WSMsgType.TEXT:
+                    continue
+                payload = json.loads(msg.data)
+                method = payload.get('method')
+                params = payload.get('params', [])
+                if method == 'PING':
+                    await ws.send_json({'id': 0, 'code': 0, 'msg': 'PONG'})
+                elif method == 'SUBSCRIPTION':
+                    channels.update(params)
+                    await ws.send_json({'id': payload.get('id', 0), 'code': 0, 'msg': ','.join(params)})
+                    if replay_task is None and self.messages:
+                        replay_task = asyncio.create_task(self._replay())
+                elif method == 'UNSUBSCRIPTION':
+                    channels.difference_update(params)
+                    await ws.send_json({'id': payload.get('id', 0), 'code': 0, 'msg': ','.join(params)})
+        except ConnectionResetError:
+            # Client parti pendant l'accuse (desabonnement juste avant la fermeture)
+            pass
+        finally:
+            if replay_task is not None:
+                replay_task.cancel()
+            self._clients.pop(ws, None)
+        return ws
+
+
+async def serve(file_path, host, port, speed, loop_replay):
+    server = ReplayServer(load_messages(file_path), speed=speed, host=host, port=port, loop_replay=loop_replay)
+    await server.start()
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Rejoue un flux WebSocket MEXC enregistre")
+    parser.add_argument('file', help="fichier JSONL de messages bruts MEXC, ou repertoire d'archive de recorder.py")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--speed', type=float, default=1.0, help="facteur de vitesse, 0 pour rejouer sans attente")
+    parser.add_argument('--loop', action='store_true', help="rejouer le fichier en boucle")
+    args = parser.parse_args()
+    asyncio.run(serve(args.file, args.host, args.port, args.speed, args.loop))
@@ -0,0 +1,115 @@
+import asyncio
+import logging
+
+from log_pipeline import event
+
+# Moteur de stops en tache de fond: chaque position ouverte a un stop suiveur, une prise de
+# profit et un stop-loss optionnels, evalues a chaque prix recu du flux (aucune attente fixe).
+# Quand l'echange accepte des ordres stop sur le marche, un ordre stop natif protege en plus
+# la position cote serveur, sans dependre de la latence du bot.
+
+
+class StopRule():
+    # Pourcentages en fraction (0.01 = 1 %); 0 ou None desactive la prise de profit ou le stop-loss
+    def __init__(self, trailing=0.01, take_profit=None, stop_loss=None):
+        self.trailing = trailing
+        self.take_profit = take_profit or None
+        self.stop_loss = stop_loss or None
+
+
+class PositionStop():
+    def __init__(self, symbol, buy_price, quantity, rule, reference):
+        self.symbol = symbol
+        self.buy_price = buy_price
+        self.quantity = quantity
+        self.rule = rule
+        self.ath = reference
+        self.last_price = reference
+        self.take_profit_price = buy_price * (1 + rule.take_profit) if rule.take_profit else None
+        self.stop_loss_price = buy_price * (1 - rule.stop_loss) if rule.stop_loss else None
+        self.native_order_id = None
+        self.native_stop_price = None
+        self.native_busy = False
+        self.triggered = asyncio.get_running_loop().create_future()
+
+    # Prix de declenchement courant: le plus haut entre le stop suiveur et le stop-loss
+    @property
+    def stop_price(self):
+        trailing = self.ath * (1 - self.rule.trailing) if self.rule.trailing else None
+        return max(price for price in (trailing, self.stop_loss_price, 0) if price is not None)
+
+    def describe(self):
+        parts = [f"stop {self.stop_price}"]
+        if self.take_profit_price:
+            parts.append(f"prise de profit {self.take_profit_price}")
+        return ", ".join(parts)
+
+    # Evaluer un nouveau prix; renvoie la raison du declenchement ou None
+    def update(self, price):
+        self.last_price = price
+        if price > self.ath:
+            self.ath = price
+            # Un ATH a chaque transaction pendant une hausse: ligne echantillonnee, formatee par le thread de log
+            logging.info("Nouveau ATH: %s USDT, stop ajusté à %s USDT pour %s", self.ath, self.stop_price, self.symbol,
+                         extra=event('new_ath', sample=self.symbol, symbol=self.symbol, price=price, stop=self.stop_price))
+        if self.take_profit_price and price >= self.take_profit_price:
+            return 'take_profit'
+        if price < self.stop_price:
+            return 'stop_loss' if self.stop_loss_price and self.stop_price == self.stop_loss_price else 'trailing_stop'
+        return None
+
+
+class StopEngine():
+    def __init__(self, feed, exchange=None, rule=None, native=False, native_limit_offset=0.01):
+        self.feed = feed
+        self.exchange = exchange
+        self.rule = rule or StopRule()
+        self.native = native
+        self.native_limit_offset = native_limit_offset
+        self.positions = {}
+        feed.add_listener(self._on_price)
+
+    def watch(self, symbol, buy_price, quantity, reference):
+        stop = PositionStop(symbol, buy_price, quantity, self.rule, reference)
+        self.positions[symbol] = stop
+        if self.native and self.exchange is not None and self.exchange.supports_native_stops(symbol):
+            asyncio.create_task(self._place_native(stop))
+        return stop
+
+    # Arreter le suivi; renvoie l'ordre stop natif s'il a ete execute (entierement ou en partie)
+    async def unwatch(self, symbol):
+        stop = self.positions.pop(symbol, None)
+        if stop is None or stop.native_order_id is None:
+            return None
+        order_id, stop.native_order_id = stop.native_order_id, None
+        await self.exchange.cancel_order(order_id, symbol)
+        order = await self.exchange.fetch_order(order_id, symbol)
+        return order if order and order.get('filled') else None
+
+    def _on_price(self, symbol, price):
+        stop = self.positions.get(symbol)
+        if stop is None or stop.triggered.done():
+            return
+        reason = stop.update(price)
+        if reason:
+            stop.triggered.set_result((reason, price))
+        elif stop.native_order_id and not stop.native_busy and stop.stop_price >= stop.native_stop_price * (1 + self.rule.trailing / 2):
+            # Remonter l'ordre natif par paliers de la moitie du stop suiveur, pas a chaque tick
+            asyncio.create_task(self._place_native(stop))
+
+    async def _place_native(self, stop):
+        stop.native_busy = True
+        try:
+            stop_price = stop.stop_price
+            if stop.native_order_id is not None:
+                old_order_id, stop.native_order_id = stop.native_order_id, None
+                await self.exchange.cancel_order(old_order_id, stop.symbol)
+            if self.positions.get(stop.symbol) is not stop or stop.triggered.done():
+                return
+            order = await self.exchange.place_stop_order(stop.symbol, stop.quantity, stop_price, stop_price * (1 - self.native_limit_offset))
+            if order is not None:
+                stop.native_order_id = order['id']
+                stop.native_stop_price = stop_price
+                logging.info(f"Ordre stop natif {order['id']} place pour {stop.symbol} a {stop_price} USDT.")
+        finally:
+            stop.native_busy = False
@@ -0,0 +1,145 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+
+from exchange_clients import registry
+from metrics import metrics
+
+# Envoi des notifications Telegram par une seule tache et une seule session HTTP partagee.
+# Les messages attendent dans une file bornee a priorites: les evenements de trade passent
+# avant les informations, et les statuts (PnL) sont fusionnes en un resume toutes les
+# status_interval secondes. Quand la file est pleine, le message le moins prioritaire est abandonne.
+
+TRADE = 0    # achats, ventes, erreurs d'ordre: jamais abandonnes
+INFO = 1     # commandes, listings, informations diverses
+STATUS = 2   # statuts periodiques, fusionnes par cle
+
+TELEGRAM_API_URL = 'https://api.telegram.org'
+
+
+class TelegramNotifier():
+    def __init__(self, bot_token, chat_id, max_queue=100, status_interval=10, min_interval=1.0, parse_mode='Markdown', api_url=TELEGRAM_API_URL):
+        self.bot_token = bot_token
+        self.api_url = api_url
+        self.chat_id = chat_id
+        self.max_queue = max_queue
+        self.status_interval = status_interval
+        self.min_interval = min_interval
+        self.parse_mode = parse_mode
+        self.sent = 0
+        self.dropped = 0
+        self._queue = []
+        self._status = {}
+        self._seq = itertools.count()
+        # Cree par run(), dans la boucle qui l'attend (avant Python 3.10, un Event cree hors de la
+        # boucle est lie a une autre boucle que celle d'asyncio.run)
+        self._wakeup = None
+        self._last_message = None
+        self._last_sent_at = 0
+        self._sending = False
+
+    def _push(self, priority, payload):
+        heapq.heappush(self._queue, (priority, next(self._seq), payload))
+        if len(self._queue) > self.max_queue:
+            # Abandonner le message le plus recent parmi les moins prioritaires, sauf un trade
+            worst = max(self._queue)
+            if worst[0] != TRADE:
+                self._queue.remove(worst)
+                heapq.heapify(self._queue)
+                self.dropped += 1
+                metrics.increment('telegram_dropped_total')
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    # Ne bloque jamais: le message est mis en file (ou fusionne s'il porte une cle de statut).
+    # Un message non statut portant une cle remplace le statut en attente pour cette cle.
+    def send(self, message, priority=INFO, key=None, reply_markup=None):
+        if key is not None:
+            if priority == STATUS:
+                self._status[key] = message
+                return
+            self._status.pop(key, None)
+        self._push(priority, {'text': message, 'reply_markup': reply_markup})
+
+    # Un seul message pour tous les statuts recus depuis le dernier resume
+    def _flush_status(self):
+        if not self._status:
+            return
+        text = "\n".join(self._status.values())
+        self._status = {}
+        self._push(STATUS, {'text': text, 'reply_markup': None})
+
+    async def _post(self, payload):
+        url = f"{self.api_url}/bot{self.bot_token}/sendMessage"
+        data = {'chat_id': self.chat_id, 'text': payload['text']}
+        if self.parse_mode:
+            data['parse_mode'] = self.parse_mode
+        if payload.get('reply_markup'):
+            data['reply_markup'] = payload['reply_markup']
+        while True:
+            with metrics.timer('telegram_request_seconds'):
+                async with registry.session().post(url, json=data) as response:
+                    result = await response.json(content_type=None)
+            if response.status == 429:
+                retry_after = (result.get('parameters') or {}).get('retry_after', 1)
+                logging.warning(f"Telegram limite les envois, nouvel essai dans {retry_after}s.")
+                await asyncio.sleep(retry_after)
+                continue
+            # Un symbole avec '_' casse le Markdown: renvoyer le message en texte brut
+            if response.status == 400 and 'parse_mode' in data and "parse entities" in str(result.get('description')):
+                data.pop('parse_mode')
+                continue
+            if response.status != 200:
+                logging.error(f"Erreur lors de l'envoi du message Telegram ({response.status}): {result.get('description')}")
+            return
+
+    async def _next(self):
+        loop = asyncio.get_running_loop()
+        next_status = loop.time() + self.status_interval
+        while not self._queue:
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), max(next_status - loop.time(), 0))
+            except asyncio.TimeoutError:
+                self._flush_status()
+                next_status = loop.time() + self.status_interval
+        return heapq.heappop(self._queue)[2]
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        last_status = loop.time()
+        while True:
+            payload = await self._next()
+            if loop.time() - last_status >= self.status_interval:
+                self._flush_status()
+                last_status = loop.time()
+            # Meme message que le precedent (ex: erreur repetee): inutile de le renvoyer
+            if payload['text'] == self._last_message and not payload.get('reply_markup'):
+                continue
+            wait = self._last_sent_at + self.min_interval - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            self._sending = True
+            try:
+                await self._post(payload)
+                self.sent += 1
+                self._last_message = payload['text']
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"Erreur lors de l'envoi du message Telegram: {e}")
+            finally:
+                self._sending = False
+            self._last_sent_at = time.monotonic()
+
+    # A l'arret: envoyer les statuts en attente et vider la file, dans la limite du timeout
+    async def close(self, task, timeout=5):
+        self._flush_status()
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while (self._queue or self._sending) and loop.time() < deadline and not task.done():
+            await asyncio.sleep(0.1)
+        task.cancel()
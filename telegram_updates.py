@@ -0,0 +1,72 @@
+import asyncio
+import json
+import logging
+import os
+
+import aiohttp
+
+from atomic_file import save_json
+from exchange_clients import registry
+from telegram_notifier import TELEGRAM_API_URL
+
+# Lecture des commandes Telegram par long polling: getUpdates reste ouvert jusqu'a l'arrivee
+# d'un message (ou timeout secondes), et l'offset du dernier update traite est sauvegarde
+# apres chaque commande. Chaque commande est ainsi traitee une seule fois, dans l'ordre,
+# meme apres un redemarrage du bot.
+
+
+class TelegramUpdates():
+    def __init__(self, bot_token, chat_id, offset_file='telegram_offset.json', timeout=30, retry_interval=10, api_url=TELEGRAM_API_URL):
+        self.bot_token = bot_token
+        self.api_url = api_url
+        self.chat_id = str(chat_id)
+        self.offset_file = offset_file
+        self.timeout = timeout
+        self.retry_interval = retry_interval
+        self.offset = self._load_offset()
+
+    def _load_offset(self):
+        if os.path.exists(self.offset_file) and os.path.getsize(self.offset_file) > 0:
+            with open(self.offset_file, 'r') as f:
+                return json.load(f).get('offset')
+        return None
+
+    # Ecriture atomique: un arret brutal laisse l'ancien offset ou le nouveau, jamais un fichier tronque
+    def _save_offset(self):
+        save_json(self.offset_file, {'offset': self.offset})
+
+    async def fetch(self):
+        url = f"{self.api_url}/bot{self.bot_token}/getUpdates"
+        params = {'timeout': self.timeout, 'allowed_updates': json.dumps(['message'])}
+        if self.offset is not None:
+            params['offset'] = self.offset
+        request_timeout = aiohttp.ClientTimeout(total=self.timeout + 10)
+        async with registry.session().get(url, params=params, timeout=request_timeout) as response:
+            data = await response.json(content_type=None)
+        if not data.get('ok'):
+            raise Exception(f"getUpdates {response.status}: {data.get('description')}")
+        return data.get('result', [])
+
+    # handler(text) est appele pour chaque commande du chat configure, une seule fois et dans l'ordre
+    async def run(self, handler):
+        while True:
+            try:
+                updates = await self.fetch()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"Erreur lors de la lecture des commandes Telegram: {e}")
+                await asyncio.sleep(self.retry_interval)
+                continue
+            for update in updates:
+                message = update.get('message') or {}
+                text = message.get('text')
+                if text and str(message.get('chat', {}).get('id')) == self.chat_id:
+                    try:
+                        await handler(text)
+                    except Exception as e:
+                        logging.error(f"Erreur lors du traitement de la commande Telegram {text}: {e}")
+                elif text:
+                    logging.warning(f"Commande Telegram ignoree, chat {message.get('chat', {}).get('id')} non autorise.")
+                self.offset = update['update_id'] + 1
+                self._save_offset()
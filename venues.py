@@ -0,0 +1,236 @@
+import asyncio
+import logging
+
+from listing_watch import normalize_symbol, unified_symbol
+from metrics import metrics
+from pair_manager import ACTIVE_STATES
+
+# Plusieurs echanges surveilles en parallele. Chaque echange (venue) a ses propres adaptateurs:
+# SpotExchange, flux de marche, surveillance des listings, suivi des ordres et PairManager.
+# Une paire demandee est suivie sur toutes les venues a la fois. La premiere venue prete a
+# acheter (listing detecte et premier prix) reserve l'achat; avec route_window > 0, les venues
+# qui listent dans cette fenetre sont comparees et l'achat va au meilleur carnet (prix moyen le
+# plus bas pour le budget). La paire est ensuite retiree des autres venues.
+# Les symboles passent par un index normalise commun (NEW/USDT, NEW_USDT, newusdt -> NEWUSDT).
+
+
+# Adaptateurs d'un echange; tasks() donne les taches a lancer pour cette venue
+class Venue():
+    def __init__(self, name, exchange, feed, orders, manager, listings=None, pricing=None, user_stream=None):
+        self.name = name
+        self.exchange = exchange
+        self.feed = feed
+        self.orders = orders
+        self.manager = manager
+        self.listings = listings
+        self.pricing = pricing
+        self.user_stream = user_stream
+
+    def tasks(self):
+        tasks = [self.feed.run()]
+        if self.user_stream is not None:
+            tasks.append(self.user_stream.run())
+        return tasks
+
+
+# Index des symboles de toutes les venues: identifiant normalise -> {venue: symbole unifie}
+class SymbolIndex():
+    def __init__(self):
+        self._symbols = {}
+
+    def update(self, venue_name, symbols):
+        for symbol in symbols:
+            self._symbols.setdefault(normalize_symbol(symbol), {})[venue_name] = symbol
+
+    def venues(self, symbol):
+        return self._symbols.get(normalize_symbol(symbol), {})
+
+    # Symbole de la venue; avant le listing, la forme unifiee de ce qui a ete demande
+    def resolve(self, venue_name, symbol):
+        listed = self.venues(symbol).get(venue_name)
+        if listed:
+            return listed
+        return symbol if '/' in symbol else unified_symbol(normalize_symbol(symbol))
+
+    def __len__(self):
+        return len(self._symbols)
+
+
+class VenuePool():
+    def __init__(self, notify, route_window=0):
+        self.notify = notify
+        self.route_window = route_window
+        self.venues = {}
+        self.index = SymbolIndex()
+        # Identifiant normalise -> nom de la venue qui a obtenu l'achat
+        self.routes = {}
+        self._pending = {}
+        self._paused = False
+
+    @property
+    def primary(self):
+        return next(iter(self.venues.values()))
+
+    def add_venue(self, venue):
+        self.venues[venue.name] = venue
+        venue.manager.router = self
+        self.index.update(venue.name, venue.exchange.market or {})
+        return venue
+
+    @property
+    def paused(self):
+        return self._paused
+
+    @paused.setter
+    def paused(self, value):
+        self._paused = value
+        for venue in self.venues.values():
+            venue.manager.paused = value
+
+    # Les positions sans venue (anciens journaux) sont reprises sur la venue principale
+    def restore(self):
+        for venue in self.venues.values():
+            venue.manager.restore(primary=venue is self.primary)
+
+    @property
+    def snipes(self):
+        return [snipe for venue in self.venues.values() for snipe in venue.manager.snipes.values()]
+
+    def tracked(self, symbol):
+        key = normalize_symbol(symbol)
+        return [(venue, snipe) for venue in self.venues.values() for snipe in venue.manager.snipes.values()
+                if normalize_symbol(snipe.symbol) == key]
+
+    # Nouveau symbole sur une venue: index mis a jour, puis la venue reveille ou arme la paire
+    def on_listing(self, venue_name, symbol):
+        self.index.update(venue_name, [symbol])
+        self.venues[venue_name].manager.on_listing(symbol)
+
+    def refresh_index(self, venue_name):
+        self.index.update(venue_name, self.venues[venue_name].exchange.market or {})
+
+    # Venue qui a obtenu l'achat, tant qu'elle suit encore la paire (un achat non execute libere la route)
+    def routed(self, symbol):
+        key = normalize_symbol(symbol)
+        venue_name = self.routes.get(key)
+        if venue_name is not None and not any(venue.name == venue_name for venue, _ in self.tracked(symbol)):
+            del self.routes[key]
+            return None
+        return venue_name
+
+    # Une paire deja routee n'est pas relancee sur les autres venues
+    def add(self, symbol, source="Telegram"):
+        venue_name = self.routed(symbol)
+        if venue_name is not None:
+            logging.info(f"La paire {symbol} est deja routee vers {venue_name}.")
+            return False
+        added = False
+        for venue in self.venues.values():
+            added = venue.manager.add(self.index.resolve(venue.name, symbol), source=f"{source}, {venue.name}") or added
+        return added
+
+    def remove(self, symbol):
+        tracked = self.tracked(symbol)
+        if not tracked:
+            self.notify(f"La paire {symbol} n'est pas suivie.")
+            return False
+        removed = False
+        for venue, snipe in tracked:
+            removed = venue.manager.remove(snipe.symbol) or removed
+        return removed
+
+    # /change_paire: la nouvelle paire remplace, sur chaque venue, celles qui attendent leur listing
+    def replace(self, symbol):
+        key = normalize_symbol(symbol)
+        for venue in self.venues.values():
+            for other in list(venue.manager.snipes.values()):
+                if normalize_symbol(other.symbol) != key and other.state not in ACTIVE_STATES:
+                    venue.manager.remove(other.symbol)
+        return self.add(symbol)
+
+    def status(self):
+        if len(self.venues) == 1:
+            return self.primary.manager.status()
+        lines = [f"[{venue.name}] {snipe.describe()}" for venue in self.venues.values() for snipe in venue.manager.snipes.values()]
+        return "\n".join(lines) if lines else "Aucune paire suivie."
+
+    # Offre d'une venue: prix moyen estime pour son budget (carnet), a defaut meilleur ask ou dernier prix
+    @staticmethod
+    def _offer(snipe, price):
+        manager = snipe.manager
+        book = manager.feed.order_book(snipe.symbol)
+        if (book or {}).get('asks') and snipe.armed.budget:
+            quote = manager.pricer.quote(book, budget=snipe.armed.budget)
+            if quote is not None:
+                return quote['average']
+        _, ask = manager.feed.top_of_book(snipe.symbol)
+        return ask or price
+
+    # Seule une venue qui peut acheter (cles API et budget positif) peut reserver l'achat
+    @staticmethod
+    def _eligible(snipe):
+        if not snipe.manager.exchange._auth:
+            return False, "pas de cles API"
+        if not snipe.armed.budget or snipe.armed.budget <= 0:
+            return False, "budget nul"
+        return True, None
+
+    # Appelee par chaque venue juste avant d'acheter; True si l'achat lui revient
+    async def claim(self, snipe, price):
+        key = normalize_symbol(snipe.symbol)
+        venue_name = snipe.manager.venue
+        routed = self.routed(snipe.symbol)
+        if routed is not None:
+            return routed == venue_name
+        eligible, reason = self._eligible(snipe)
+        if not eligible:
+            logging.warning(f"Achat de {snipe.symbol} impossible sur {venue_name} ({reason}), laisse aux autres venues.")
+            return False
+        offer = self._offer(snipe, price)
+        if self.route_window <= 0 or len(self.venues) == 1:
+            # Premiere venue a lister: aucune attente sur le chemin critique
+            self._route(key, snipe.symbol, {venue_name: offer}, venue_name)
+            return True
+        pending = self._pending.get(key)
+        if pending is not None:
+            pending['offers'][venue_name] = offer
+            return await asyncio.shield(pending['winner']) == venue_name
+        winner = asyncio.get_running_loop().create_future()
+        pending = self._pending[key] = {'offers': {venue_name: offer}, 'winner': winner}
+        try:
+            await asyncio.sleep(self.route_window)
+            offers = pending['offers']
+            best = min(offers, key=lambda name: (offers[name] is None, offers[name] or 0))
+            self._route(key, snipe.symbol, offers, best)
+            winner.set_result(best)
+        finally:
+            self._pending.pop(key, None)
+            if not winner.done():
+                winner.cancel()
+        return best == venue_name
+
+    # Achat route non execute: la route est liberee et la paire relancee sur les autres venues
+    def release(self, snipe):
+        key = normalize_symbol(snipe.symbol)
+        venue_name = snipe.manager.venue
+        if self.routes.get(key) != venue_name:
+            return
+        del self.routes[key]
+        logging.info(f"Achat de {snipe.symbol} non execute sur {venue_name}, paire relancee sur les autres venues.")
+        tracked = set(venue.name for venue, _ in self.tracked(snipe.symbol))
+        for venue in self.venues.values():
+            if venue.name != venue_name and venue.name not in tracked:
+                venue.manager.add(self.index.resolve(venue.name, snipe.symbol), source=f"achat non execute sur {venue_name}, {venue.name}")
+
+    # Achat attribue: la paire est retiree des venues qui attendent encore
+    def _route(self, key, symbol, offers, venue_name):
+        self.routes[key] = venue_name
+        metrics.increment('venue_routes_total', venue=venue_name)
+        details = ", ".join(f"{name}: {offer}" for name, offer in offers.items())
+        logging.info(f"Achat de {symbol} route vers {venue_name} ({details}).")
+        if len(self.venues) > 1:
+            self.notify(f"🔀 Achat de {symbol} routé vers {venue_name} ({details}).")
+        for venue, snipe in self.tracked(symbol):
+            if venue.name != venue_name and snipe.state not in ACTIVE_STATES and venue.name not in offers:
+                venue.manager.withdraw(snipe.symbol, f"achat route vers {venue_name}")
+